@@ -3,6 +3,8 @@ import time
 import os
 import json
 from config import Config
+from metrics import observe_ai_call, count_ai_request
+from provider_guard import ProviderGuard, ProviderUnavailable
 
 # Optional: Real AI Library
 try:
@@ -11,11 +13,18 @@ except ImportError:
     genai = None
 
 class AIEngine:
-    def __init__(self):
-        self.provider = Config.AI_PROVIDER
+    def __init__(self, provider=None, model=None, guard=None):
+        self.provider = provider or Config.AI_PROVIDER
         self.api_key = os.environ.get('GEMINI_API_KEY')
+        self.model = model # Injectable, e.g. provider_guard.FakeProvider
+        self.guard = guard or ProviderGuard(rate=Config.AI_RATE_PER_MINUTE / 60,
+                                            burst=Config.AI_BURST,
+                                            failure_threshold=Config.AI_FAILURE_THRESHOLD,
+                                            reset_timeout=Config.AI_RESET_TIMEOUT,
+                                            slow_call_seconds=Config.AI_CALL_TIMEOUT,
+                                            shared='ai_provider') # One quota across workers and the CLI
         
-        if self.provider == "gemini" and self.api_key and genai:
+        if self.model is None and self.provider == "gemini" and self.api_key and genai:
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel('gemini-pro')
 
@@ -117,10 +126,32 @@ class AIEngine:
             }
         }
 
+    def _generate(self, operation, prompt):
+        """Single choke point for provider calls: guarded, timed and counted."""
+        start = time.perf_counter()
+        try:
+            # A real deadline: a hung call is cut off instead of blocking the request
+            response = self.guard.call(self.model.generate_content, prompt,
+                                       request_options={"timeout": Config.AI_CALL_TIMEOUT})
+        except ProviderUnavailable:
+            raise # Never reached the provider, so no latency to record
+        except Exception:
+            observe_ai_call(operation, time.perf_counter() - start, ok=False)
+            raise
+        observe_ai_call(operation, time.perf_counter() - start, ok=True)
+        return response
+
     def generate_explanation(self, topic_name, student_level="Beginner"):
         """
         Real AI or Robust Mock Fallback.
         """
+        return self.explanation_with_source(topic_name, student_level)[0]
+
+    def explanation_with_source(self, topic_name, student_level="Beginner"):
+        """
+        (content, source): source is 'provider', 'offline' (no provider configured)
+        or 'fallback' (the provider failed or the guard rejected the call).
+        """
         # Try finding subject ID in syllabus if name is passed, or lookup by ID directly
         topic_id = self._find_id_by_name(topic_name)
         
@@ -128,15 +159,91 @@ class AIEngine:
              try:
                  # Real Generation Logic (Simplified)
                  prompt = f"Explain {topic_name} for a college student. content: title, explanation, key_points, example."
-                 response = self.model.generate_content(prompt)
-                 return self._parse_gemini(response.text)
+                 response = self._generate('explanation', prompt)
+                 count_ai_request('explanation', 'provider')
+                 return self._parse_gemini(response.text), 'provider'
              except Exception as e:
                  print(f"AI Error: {e}")
+                 count_ai_request('explanation', 'fallback')
+                 source = 'fallback'
+        else:
+            count_ai_request('explanation', 'offline')
+            source = 'offline'
         
         # Fallback to Knowledge Base
-        return self._get_kb_content(topic_id, topic_name)
+        return self._get_kb_content(topic_id, topic_name), source
 
     def generate_quiz(self, topic_name, difficulty="Easy", num_questions=25, global_seed=0):
+        return self.quiz_with_source(topic_name, difficulty, num_questions, global_seed)[0]
+
+    def quiz_with_source(self, topic_name, difficulty="Easy", num_questions=25, global_seed=0):
+        """
+        (questions, source): source is 'kb' (enough KB questions), 'provider', 'offline'
+        or 'fallback' (the provider failed or the guard rejected the call).
+        """
+        formatted = self._kb_questions(topic_name, difficulty)
+        
+        # AI Generation if needed (if gemini is available)
+        source = 'kb' if len(formatted) >= num_questions else 'offline'
+        if len(formatted) < num_questions and self.provider == "gemini" and self.model:
+            try:
+                needed = num_questions - len(formatted)
+                prompt = f"Generate {needed} MCQ questions for {topic_name} at {difficulty} level. Return JSON list of {{q, options[], a}}."
+                response = self._generate('quiz', prompt)
+                ai_questions = self._parse_quiz_json(response.text)
+                source = 'provider' if ai_questions else 'fallback'
+                self._append_ai_questions(formatted, ai_questions)
+            except Exception as e:
+                print(f"AI Quiz Gen Error: {e}")
+                source = 'fallback'
+        count_ai_request('quiz', source)
+ 
+        self._fill_with_mock(formatted, topic_name, difficulty, num_questions, global_seed)
+        return formatted[:num_questions], source
+
+    def generate_quiz_batch(self, requests, difficulty="Easy"):
+        """
+        Quiz questions for many topics with one provider call per Config.AI_BATCH_TOPICS topics.
+        requests: list of (topic_name, num_questions, global_seed). Returns one list per request.
+        Topics missing or malformed in the batch response fall back to generate_quiz.
+        """
+        results = [self._kb_questions(name, difficulty) for name, _, _ in requests]
+        pending = [i for i, (_, n, _) in enumerate(requests) if len(results[i]) < n]
+        
+        if pending and self.provider == "gemini" and self.model:
+            size = Config.AI_BATCH_TOPICS
+            for chunk in (pending[i:i + size] for i in range(0, len(pending), size)):
+                # Keyed by request index: the same topic can be requested twice in one chunk
+                wanted = {i: requests[i][1] - len(results[i]) for i in chunk}
+                names = {i: requests[i][0] for i in chunk}
+                try:
+                    response = self._generate('quiz_batch', self._batch_prompt(wanted, names, difficulty))
+                    parsed = self._parse_quiz_batch_json(response.text, wanted, names)
+                except Exception as e:
+                    # The provider itself failed: don't retry topic by topic, go straight to mock
+                    print(f"AI Batch Quiz Gen Error: {e}")
+                    for i in chunk:
+                        count_ai_request('quiz', 'fallback')
+                    continue
+                for i in chunk:
+                    name, n, seed = requests[i]
+                    questions = parsed.get(i, [])
+                    if len(questions) >= wanted[i]:
+                        self._append_ai_questions(results[i], questions[:wanted[i]])
+                        count_ai_request('quiz', 'provider')
+                    else:
+                        # Partial batch failure: this topic alone goes through the single path
+                        results[i] = self.generate_quiz(name, difficulty, n, seed)
+        else:
+            for i in pending:
+                count_ai_request('quiz', 'offline')
+        
+        for i, (name, n, seed) in enumerate(requests):
+            self._fill_with_mock(results[i], name, difficulty, n, seed)
+            results[i] = results[i][:n]
+        return results
+
+    def _kb_questions(self, topic_name, difficulty):
         topic_id = self._find_id_by_name(topic_name)
         
         # KB Lookup
@@ -156,36 +263,33 @@ class AIEngine:
                 "options": self._shuffle_options(q['options']),
                 "answer": q['a']
             })
-        
-        # AI Generation if needed (if gemini is available)
-        if len(formatted) < num_questions and self.provider == "gemini" and self.model:
-            try:
-                needed = num_questions - len(formatted)
-                prompt = f"Generate {needed} MCQ questions for {topic_name} at {difficulty} level. Return JSON list of {{q, options[], a}}."
-                response = self.model.generate_content(prompt)
-                ai_questions = self._parse_quiz_json(response.text)
-                for i, q in enumerate(ai_questions):
-                    formatted.append({
-                        "id": len(formatted)+1,
-                        "question": q['q'],
-                        "options": self._shuffle_options(q['options']),
-                        "answer": q['a']
-                    })
-            except Exception as e:
-                print(f"AI Quiz Gen Error: {e}")
- 
-        # Supplement with dynamic mock questions if still short
-        while len(formatted) < num_questions:
-            idx = len(formatted) + global_seed
-            q_data = self._smart_mock_question(topic_name, idx, difficulty)
+        return formatted
+
+    def _append_ai_questions(self, formatted, ai_questions):
+        for q in ai_questions:
             formatted.append({
-                "id": len(formatted) + 1,
-                "question": q_data['q'],
-                "options": q_data['options'], # Already shuffled/varied in helper
-                "answer": q_data['a']
+                "id": len(formatted)+1,
+                "question": q['q'],
+                "options": self._shuffle_options(q['options']),
+                "answer": q['a']
             })
-             
-        return formatted[:num_questions]
+
+    def _fill_with_mock(self, formatted, topic_name, difficulty, num_questions, global_seed):
+        # Supplement with dynamic mock questions if still short
+        while len(formatted) < num_questions:
+            q = self.mock_question(topic_name, difficulty, len(formatted) + global_seed)
+            q['id'] = len(formatted) + 1
+            formatted.append(q)
+
+    def mock_question(self, topic_name, difficulty, seed):
+        """One offline question; different seeds give different templates/distractors."""
+        q_data = self._smart_mock_question(topic_name, seed, difficulty)
+        return {
+            "id": 1,
+            "question": q_data['q'],
+            "options": q_data['options'], # Already shuffled/varied in helper
+            "answer": q_data['a']
+        }
 
     def _smart_mock_question(self, topic, index, difficulty):
         # Use a hash of (topic + index) to ensure unique templates and variations
@@ -273,17 +377,75 @@ class AIEngine:
             "summary": "AI summary"
         }
 
+    def _strip_fence(self, text):
+        # Try to find JSON block in markdown
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0]
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0]
+        return text
+
     def _parse_quiz_json(self, text):
         try:
-            # Try to find JSON block in markdown
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-            return json.loads(text)
+            return json.loads(self._strip_fence(text))
         except:
             return []
 
+    def _batch_prompt(self, wanted, names, difficulty):
+        lines = [f"- id {i}: {names[i]} ({n} questions)" for i, n in wanted.items()]
+        return (
+            f"Generate multiple-choice questions at {difficulty} level for each topic below.\n"
+            + "\n".join(lines) + "\n"
+            'Return only JSON of the form {"topics": [{"id": <id as given>, "topic": "<topic name>", '
+            '"questions": [{"q": "...", "options": ["...", "...", "...", "..."], "a": "<one of options>"}]}]}'
+        )
+
+    def _valid_question(self, q):
+        if not isinstance(q, dict) or not isinstance(q.get('q'), str) or not q['q'].strip():
+            return False
+        options = q.get('options')
+        if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+            return False
+        return len(set(options)) == len(options) and q.get('a') in options
+
+    def _parse_quiz_batch_json(self, text, wanted, names):
+        """
+        Split a batched response back into {request index: [valid questions]}.
+        Entries are matched by id; one without a usable id falls back to its topic name
+        when that name is unique in the chunk. Invalid questions are dropped; requests
+        the model omitted or couldn't be matched are simply absent.
+        """
+        try:
+            data = json.loads(self._strip_fence(text))
+        except (ValueError, TypeError):
+            return {}
+        entries = data.get('topics') if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return {}
+        
+        by_name = {}
+        for i, name in names.items():
+            by_name.setdefault(name.strip().lower(), []).append(i)
+        parsed = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index = self._batch_entry_id(entry.get('id'), wanted)
+            if index is None and isinstance(entry.get('topic'), str):
+                ids = by_name.get(entry['topic'].strip().lower(), [])
+                index = ids[0] if len(ids) == 1 else None
+            questions = entry.get('questions')
+            if index is not None and isinstance(questions, list):
+                parsed.setdefault(index, []).extend(q for q in questions if self._valid_question(q))
+        return parsed
+
+    def _batch_entry_id(self, value, wanted):
+        try:
+            index = int(value)
+        except (ValueError, TypeError):
+            return None
+        return index if index in wanted else None
+
     def analyze_performance(self, scores_data):
         total_score = sum(s['score'] for s in scores_data)
         total_possible = sum(s['total'] for s in scores_data)
@@ -302,10 +464,14 @@ class AIEngine:
         if self.provider == "gemini" and self.model:
             try:
                 chat_prompt = f"You are a helpful study assistant for a Computer Science student. Answer this doubt concisely: {user_query}"
-                response = self.model.generate_content(chat_prompt)
+                response = self._generate('chat', chat_prompt)
+                count_ai_request('chat', 'provider')
                 return response.text
             except Exception as e:
                 print(f"Chat AI Error: {e}")
+                count_ai_request('chat', 'fallback')
+        else:
+            count_ai_request('chat', 'offline')
         
         # Smart Mock Response
         keywords = {
@@ -1,18 +1,95 @@
 from flask import Flask, render_template, request, redirect, url_for, session, jsonify
 from config import Config
 from data_manager import check_user, create_user, get_student_progress, update_progress, load_json, save_json
+from data_manager import update_review_schedule, get_due_reviews, OVERALL_BOARD, tenant_dir, enable_wal, prime_db
+from data_manager import get_content
+from precompute import start_background_precompute, precompute_status
+from sampler import new_rng, sample_topics
+from tenants import current_tenant, get_tenant_state, list_tenants
+from syllabus_index import get_syllabus_index, invalidate_syllabus_index
+from search_index import get_search_index
 from ai_engine import AIEngine
+from dedup import QuestionDeduper
+from quiz_store import issue_quiz, grade_quiz, valid_answers
+import metrics
+import query_debug
+import tenants
 import os
+import gzip
+import json
+import random
+from itertools import chain
 
 app = Flask(__name__)
 app.config.from_object(Config)
 app.jinja_env.add_extension('jinja2.ext.do')
+metrics.init_app(app)
+query_debug.init_app(app)
+tenants.init_app(app)
 
-ai = AIEngine()
+ai = AIEngine() # Shared by all tenants: it holds no tenant data, and the provider quota is global anyway
 
 # --- Helpers ---
 def get_syllabus():
-    return load_json('syllabus.json')
+    return get_syllabus_index(current_tenant()).syllabus
+
+def get_cached_content(topic_id, topic_name, kind, difficulty=''):
+    """
+    Precomputed content through the current tenant's in-memory cache. Keyed on the
+    topic name too, so content generated for an earlier syllabus that used the same
+    id for another topic is never served (other workers' caches aren't cleared on upload).
+    """
+    tenant_id = current_tenant()
+    return get_tenant_state(tenant_id).content.get_or_load(
+        (topic_id, topic_name, kind, difficulty),
+        lambda: get_content(topic_id, kind, difficulty, tenant_id, topic_name))
+
+def get_review_queue(username, limit=5):
+    index = get_syllabus_index(current_tenant())
+    reviews = get_due_reviews(username, limit=limit, tenant_id=current_tenant())
+    for r in reviews:
+        r['name'] = index.topic_name(r['topic_id'], r['topic_id'])
+    return reviews
+
+DEDUP_RETRIES = 6 # Replacement attempts per near-duplicate before keeping it anyway
+
+def dedupe_questions(items, difficulty):
+    """
+    items: [(topic name, question)] in paper order. A question that near-duplicates an
+    earlier one is swapped for a differently seeded mock question on the same topic.
+    """
+    deduper = QuestionDeduper()
+    questions = []
+    for n, (topic_name, q) in enumerate(items):
+        replacements = (ai.mock_question(topic_name, difficulty, 1000 * attempt + n)
+                        for attempt in range(1, DEDUP_RETRIES + 1))
+        for candidate in chain([q], replacements):
+            if deduper.add(candidate['question'], topic_name):
+                break
+        else:
+            # No unique replacement: keep the real question and index it so later copies are caught
+            candidate = q
+            deduper.add(q['question'], topic_name, force=True)
+        questions.append(candidate)
+    return questions
+
+def search_topics(query, limit=10):
+    kb_titles = {tid: entry['title'] for tid, entry in ai.kb.items()}
+    return get_search_index(kb_titles, current_tenant()).search(query, limit)
+
+def get_topic_quiz(topic_id, topic_name, difficulty, num_questions=5):
+    """Serve from the precomputed question bank when there is one, else generate."""
+    bank = get_cached_content(topic_id, topic_name, 'quiz_bank', difficulty)
+    if not bank:
+        questions = ai.generate_quiz(topic_name, difficulty, num_questions=num_questions)
+        return dedupe_questions([(topic_name, q) for q in questions], difficulty)
+    
+    # Copies: the bank is shared through the tenant's content cache
+    questions = [dict(q, options=list(q['options'])) for q in random.sample(bank, min(num_questions, len(bank)))]
+    for i, q in enumerate(questions):
+        q['id'] = i + 1
+        random.shuffle(q['options'])
+    return questions
 
 # --- Routes ---
 
@@ -27,10 +104,11 @@ def login():
     username = request.form.get('username')
     password = request.form.get('password')
     
-    user = check_user(username, password)
+    user = check_user(username, password, current_tenant())
     if user:
         user['info_username'] = username 
         session['user'] = user
+        session['tenant'] = current_tenant()
         return redirect(url_for('dashboard'))
     else:
         return render_template('login.html', error="Invalid Credentials.")
@@ -45,7 +123,7 @@ def register():
         email = request.form.get('email')
         role = request.form.get('role', 'student')
         
-        if create_user(username, password, roll_number, name, email, role):
+        if create_user(username, password, roll_number, name, email, role, current_tenant()):
             return redirect(url_for('index'))
         else:
             return render_template('register.html', error="Username already exists.")
@@ -65,9 +143,9 @@ def dashboard():
     if user.get('role') == 'professor':
         return redirect(url_for('professor_dashboard'))
     
-    progress = get_student_progress(user_id(user))
+    progress = get_student_progress(user_id(user), current_tenant())
     syllabus = get_syllabus()
-    syllabus_meta = load_json('syllabus_meta.json')
+    syllabus_meta = load_json('syllabus_meta.json', current_tenant())
     
     # Calculate stats and per-subject readiness
     total_topics = 0
@@ -124,26 +202,17 @@ def dashboard():
                            progress=progress, 
                            percent=percent,
                            subjects=subjects_data,
-                           syllabus_meta=syllabus_meta)
+                           syllabus_meta=syllabus_meta,
+                           reviews=get_review_queue(user_id(user)))
 
 @app.route('/learn/<topic_id>')
 def learn(topic_id):
     if 'user' not in session: return redirect(url_for('index'))
     
-    # Find topic name from syllabus (inefficient search but fine for demo)
-    topic_name = "Unknown Topic"
-    syllabus = get_syllabus()
-    for subj in syllabus.get('subjects', []):
-        for unit in subj.get('units', []):
-            for t in unit.get('topics', []):
-                if t['id'] == topic_id:
-                    topic_name = t['name']
-                    break
-            if topic_name != "Unknown Topic": break
-        if topic_name != "Unknown Topic": break
+    topic_name = get_syllabus_index(current_tenant()).topic_name(topic_id, "Unknown Topic")
     
-    # Get AIGEN content
-    content = ai.generate_explanation(topic_name)
+    # Get AIGEN content (precomputed when available)
+    content = get_cached_content(topic_id, topic_name, 'explanation') or ai.generate_explanation(topic_name)
     
     return render_template('learning.html', topic_id=topic_id, topic_name=topic_name, content=content)
 
@@ -151,7 +220,7 @@ def learn(topic_id):
 def mark_complete(topic_id):
     if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
     
-    update_progress(user_id(session['user']), topic_id, 'complete', True)
+    update_progress(user_id(session['user']), topic_id, 'complete', True, current_tenant())
     return jsonify({"status": "success", "message": "Topic marked as complete"})
 
 @app.route('/settings/update_difficulty', methods=['POST'])
@@ -161,37 +230,75 @@ def update_difficulty():
     session['difficulty'] = data.get('difficulty', 'Moderate')
     return jsonify({"status": "success"})
 
+# Quiz pages are shells; questions come from /api/quiz (answers stay on the server)
+
 @app.route('/quiz/<topic_id>')
 def quiz(topic_id):
     if 'user' not in session: return redirect(url_for('index'))
-    
-    # Determine difficulty from session or credential
-    difficulty = session.get('difficulty', 'Moderate') 
-    
-    # Find topic name from syllabus
-    topic_name = "General Topic"
-    syllabus = get_syllabus()
-    for subj in syllabus.get('subjects', []):
-        for unit in subj.get('units', []):
-            for t in unit.get('topics', []):
-                if t['id'] == topic_id:
-                    topic_name = t['name']
-                    break
-            if topic_name != "General Topic": break
-        if topic_name != "General Topic": break
-
-    questions = ai.generate_quiz(topic_name, difficulty, num_questions=5)
-    return render_template('quiz.html', topic_id=topic_id, questions=questions, quiz_type='topic')
+    return render_template('quiz.html', topic_id=topic_id, quiz_type='topic',
+                           quiz_url=url_for('api_quiz', kind='topic', id=topic_id))
 
 @app.route('/subject_exam/<subj_id>')
 def subject_exam(subj_id):
     if 'user' not in session: return redirect(url_for('index'))
     
+    subject_name = get_syllabus_index(current_tenant()).subjects.get(subj_id)
+    if not subject_name:
+        return redirect(url_for('dashboard'))
+    return render_template('quiz.html', topic_id=subj_id, quiz_type='semester', subject_name=subject_name,
+                           quiz_url=url_for('api_quiz', kind='subject', id=subj_id))
+
+@app.route('/mock_exam')
+def mock_exam():
+    if 'user' not in session: return redirect(url_for('index'))
+    # Fix the seed here so the page shows it and a reload of the API returns the same paper
+    _, seed = new_rng(request.args.get('seed', type=int))
+    return render_template('quiz.html', topic_id="mock_final", quiz_type='semester', paper_seed=seed,
+                           quiz_url=url_for('api_quiz', kind='mock', seed=seed))
+
+@app.route('/api/quiz')
+def api_quiz():
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
+    
+    kind = request.args.get('kind', 'topic')
+    item_id = request.args.get('id', '')
+    if kind == 'topic':
+        topic_id, questions = item_id, build_topic_quiz(item_id)
+    elif kind == 'subject':
+        topic_id, questions = item_id, build_subject_exam(item_id)
+    elif kind == 'mock':
+        topic_id, questions = "mock_final", build_mock_exam(request.args.get('seed', type=int))
+    else:
+        return jsonify({"error": "Unknown quiz kind"}), 400
+    if questions is None:
+        return jsonify({"error": "Not found"}), 404
+    
+    payload = issue_quiz(user_id(session['user']), topic_id, questions, current_tenant())
+    return compressed_json(payload)
+
+def compressed_json(payload):
+    """Compact JSON, gzipped when the client accepts it and it's big enough to matter."""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= Config.QUIZ_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def build_topic_quiz(topic_id):
+    # Determine difficulty from session or credential
+    difficulty = session.get('difficulty', 'Moderate') 
+    
+    topic_name = get_syllabus_index(current_tenant()).topic_name(topic_id, "General Topic")
+    return get_topic_quiz(topic_id, topic_name, difficulty, num_questions=5)
+
+def build_subject_exam(subj_id):
     syllabus = get_syllabus()
     subject = next((s for s in syllabus.get('subjects', []) if s['id'] == subj_id), None)
     
     if not subject:
-        return redirect(url_for('dashboard'))
+        return None
     
     all_questions = []
     difficulty = session.get('difficulty', 'Moderate')
@@ -200,58 +307,76 @@ def subject_exam(subj_id):
     units = subject.get('units', [])[:5] 
     
     q_counter = 0 # Global seed for unique mock generation
-    for unit in units:
+    plan = [] # (unit index, (topic name, questions, seed)) for one batched generation
+    for u, unit in enumerate(units):
         topics = unit.get('topics', [])
         if not topics: continue
         
-        unit_qs = []
+        planned = 0
         # Distribute 5 questions across topics in this unit
         for i, topic in enumerate(topics):
-            if len(unit_qs) >= 5: break
+            if planned >= 5: break
             
             # How many questions to take from this topic
             needed = 1
             if i == len(topics) - 1: # Last topic gets remainder
-                needed = 5 - len(unit_qs)
-            elif len(unit_qs) + (len(topics) - i) <= 5: 
+                needed = 5 - planned
+            elif planned + (len(topics) - i) <= 5: 
                 needed = 1 # Take at least 1 per topic if space allows
             
             if needed <= 0: continue
             
-            qs = ai.generate_quiz(topic['name'], difficulty, num_questions=needed, global_seed=q_counter)
-            unit_qs.extend(qs)
+            plan.append((u, (topic['name'], needed, q_counter)))
+            planned += needed
             q_counter += needed
-            
+    
+    batches = ai.generate_quiz_batch([req for _, req in plan], difficulty)
+    for u in range(len(units)):
+        unit_qs = [(req[0], q) for (pu, req), qs in zip(plan, batches) if pu == u for q in qs]
         all_questions.extend(unit_qs[:5])
 
     # Ensure we have exactly 25 if possible
-    final_questions = all_questions[:25]
+    final_questions = dedupe_questions(all_questions[:25], difficulty)
     for i, q in enumerate(final_questions):
         q['id'] = i + 1 # Re-index for UI
-        
-    return render_template('quiz.html', 
-                           topic_id=subj_id, 
-                           questions=final_questions, 
-                           quiz_type='semester',
-                           subject_name=subject['name'])
+    return final_questions
 
 @app.route('/submit_quiz', methods=['POST'])
 def submit_quiz():
     if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
     
-    data = request.json
-    topic_id = data.get('topic_id')
-    score = data.get('score') # In a real app, calculate on backend
-    total = data.get('total')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('token', ''), str) or not valid_answers(data.get('answers')):
+        return jsonify({"error": "Expected {token, answers: [option index or null, ...]}"}), 400
+    # Graded against the answer key issued with the quiz; client-reported scores aren't accepted
+    graded = grade_quiz(data.get('token', ''), user_id(session['user']), data.get('answers'), current_tenant())
+    if graded is None:
+        return jsonify({"error": "Quiz expired or already submitted"}), 400
+    topic_id, score, total = graded
     
     update_progress(user_id(session['user']), topic_id, 'score', {
         "topic_id": topic_id,
         "score": score, 
         "total": total, 
         "timestamp": "Now"
-    })
+    }, current_tenant())
+    
+    # Only syllabus topics are scheduled; subject/mock exams have no single topic to revise
+    if get_syllabus_index(current_tenant()).topic(topic_id) and total:
+        update_review_schedule(user_id(session['user']), topic_id, score, total, tenant_id=current_tenant())
+    
+    return jsonify({"status": "success", "score": score, "total": total, "redirect": url_for('analysis')})
+
+@app.route('/review')
+def review():
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
     
-    return jsonify({"status": "success", "redirect": url_for('analysis')})
+    limit = min(request.args.get('limit', 5, type=int), 50)
+    reviews = get_review_queue(user_id(session['user']), limit=limit)
+    for r in reviews:
+        r['quiz_url'] = url_for('quiz', topic_id=r['topic_id'])
+        r['learn_url'] = url_for('learn', topic_id=r['topic_id'])
+    return jsonify({"due": reviews})
 
 # --- Professor Routes ---
 
@@ -267,7 +392,7 @@ def class_analytics():
         return redirect(url_for('index'))
     
     from data_manager import get_class_analytics
-    analytics = get_class_analytics()
+    analytics = get_class_analytics(current_tenant())
     return render_template('class_analytics.html', analytics=analytics)
 
 @app.route('/professor/upload_syllabus', methods=['POST'])
@@ -277,16 +402,34 @@ def upload_syllabus():
     
     file = request.files.get('syllabus')
     if file and file.filename.endswith('.json'):
-        file.save(os.path.join('data', 'syllabus.json'))
+        tenant_id = current_tenant()
+        os.makedirs(tenant_dir(tenant_id), exist_ok=True)
+        file.save(os.path.join(tenant_dir(tenant_id), 'syllabus.json'))
         
         # Update metadata
         from datetime import datetime
         meta = {"last_updated": datetime.now().strftime("%d %b %Y, %H:%M")}
-        save_json('syllabus_meta.json', meta)
+        save_json('syllabus_meta.json', meta, tenant_id)
+        # Only this tenant's warm state is dropped
+        invalidate_syllabus_index(tenant_id)
+        get_tenant_state(tenant_id).content.clear()
+        if app.config.get('PRECOMPUTE_ON_UPLOAD'):
+            # Queued behind a run already in progress, which only covers the previous syllabus
+            start_background_precompute(ai, tenant_id)
         
         return redirect(url_for('professor_dashboard'))
     return "Invalid file format", 400
 
+@app.route('/professor/precompute_status')
+def precompute_progress():
+    if 'user' not in session or session['user'].get('role') != 'professor':
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(precompute_status(current_tenant()))
+
+@app.route('/health/ai')
+def ai_health():
+    return jsonify({"provider": ai.provider, "guard": ai.guard.snapshot()})
+
 @app.route('/chatbot')
 def chatbot():
     if 'user' not in session: return redirect(url_for('index'))
@@ -305,7 +448,7 @@ def chat():
 def analysis():
     if 'user' not in session: return redirect(url_for('index'))
     
-    progress = get_student_progress(user_id(session['user']))
+    progress = get_student_progress(user_id(session['user']), current_tenant())
     scores_map = progress.get('quiz_scores', {})
     scores = []
     for tid, data in scores_map.items():
@@ -350,7 +493,21 @@ def analysis():
     return render_template('analysis.html', 
                            analysis=analysis_result, 
                            scores=progress.get('quiz_scores', {}),
-                           subjects=subjects_data)
+                           subjects=subjects_data,
+                           standing=get_tenant_state().leaderboard.rank(user_id(session['user'])))
+
+@app.route('/leaderboard')
+def class_leaderboard():
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
+    
+    subject_id = request.args.get('subject', OVERALL_BOARD)
+    limit = min(request.args.get('n', 10, type=int), 100)
+    board = get_tenant_state().leaderboard
+    return jsonify({
+        "subject": subject_id,
+        "top": board.top(subject_id, limit),
+        "me": board.rank(user_id(session['user']), subject_id)
+    })
 
 @app.route('/semester_prep')
 def semester_prep():
@@ -367,6 +524,19 @@ def topic_list():
     if 'user' not in session: return redirect(url_for('index'))
     return render_template('topic_list.html', subjects=get_syllabus().get('subjects', []))
 
+@app.route('/api/search')
+def api_search():
+    if 'user' not in session: return jsonify({"error": "Unauthorized"}), 401
+    
+    limit = min(request.args.get('n', 10, type=int), 50)
+    results = search_topics(request.args.get('q', ''), limit)
+    for r in results:
+        if r['type'] == 'topic':
+            r['url'] = url_for('learn', topic_id=r['id'])
+        else:
+            r['url'] = url_for('topic_list') + '#' + r['id']
+    return jsonify({"results": results})
+
 @app.route('/settings')
 def settings():
     if 'user' not in session: return redirect(url_for('index'))
@@ -378,7 +548,7 @@ def add_subject():
     data = request.json
     
     # Helper to append to syllabus.json
-    syllabus = load_json('syllabus.json')
+    syllabus = load_json('syllabus.json', current_tenant())
     new_sub = {
         "id": data['id'],
         "name": data['name'],
@@ -393,39 +563,31 @@ def add_subject():
     
     if "subjects" not in syllabus: syllabus["subjects"] = []
     syllabus["subjects"].append(new_sub)
-    save_json('syllabus.json', syllabus)
+    save_json('syllabus.json', syllabus, current_tenant())
+    invalidate_syllabus_index(current_tenant())
     
     return jsonify({"status": "success"})
 
-@app.route('/mock_exam')
-def mock_exam():
-    if 'user' not in session: return redirect(url_for('index'))
-    # Generate a random mixed quiz from all subjects
-    # For demo, just picking first topic of first 3 subjects
-    syllabus = get_syllabus()
-    all_topics = []
-    for subj in syllabus.get('subjects', []):
-        for unit in subj.get('units', []):
-            for t in unit.get('topics', []):
-                all_topics.append(t['name'])
+def build_mock_exam(seed=None):
+    # 25 topics stratified across subjects and units, favouring the student's weak topics.
+    # The same seed regenerates the same paper.
+    rng, seed = new_rng(seed)
+    scores = get_student_progress(user_id(session['user']), current_tenant()).get('quiz_scores', {})
+    weak = [tid for tid, s in scores.items() if s['total'] and s['score'] < s['total'] * 0.6]
+    topics = sample_topics(get_syllabus_index(current_tenant()), 25, rng, weak)
     
-    # Shuffle and pick topics to get 25 questions
-    import random
-    random.shuffle(all_topics)
-    
-    questions = []
-    # Try to get 1 question from each unique topic until we have 25
-    for topic_name in all_topics:
-        if len(questions) >= 25: break
-        qs = ai.generate_quiz(topic_name, "Hard", num_questions=1)
-        if qs: questions.append(qs[0])
+    batches = ai.generate_quiz_batch([(t['name'], 1, i) for i, t in enumerate(topics)], "Hard")
+    items = [(t['name'], qs[0]) for t, qs in zip(topics, batches) if qs]
     
     # If still short, supplement
-    if len(questions) < 25:
-        more = ai.generate_quiz("General Knowledge", "Hard", num_questions=(25 - len(questions)))
-        questions.extend(more)
+    if len(items) < 25:
+        more = ai.generate_quiz("General Knowledge", "Hard", num_questions=(25 - len(items)))
+        items.extend(("General Knowledge", q) for q in more)
+    questions = dedupe_questions(items, "Hard")
             
-    return render_template('quiz.html', topic_id="mock_final", questions=questions, quiz_type='semester')
+    for i, q in enumerate(questions):
+        q['id'] = i + 1
+    return questions
 
 def user_id(user_obj):
     # Helper to get the key from the dict. 
@@ -444,5 +606,34 @@ def login_new():
     # Will overwrite the previous login function logic
     pass
 
+# --- Production entrypoint (wsgi.py / gunicorn.conf.py) ---
+
+HOT_TEMPLATES = ('dashboard.html', 'analysis.html', 'learning.html', 'quiz.html', 'topic_list.html')
+
+def warm_shared_state():
+    """Build read-mostly state once in the master so forked workers share it copy-on-write."""
+    enable_wal()
+    kb_titles = {tid: entry['title'] for tid, entry in ai.kb.items()}
+    for tenant_id in list_tenants():
+        get_syllabus_index(tenant_id)
+        get_search_index(kb_titles, tenant_id)
+        get_tenant_state(tenant_id).leaderboard.sync()
+    for name in HOT_TEMPLATES:
+        app.jinja_env.get_template(name)
+
+def warm_worker():
+    """Per-worker warm-up, run before the worker accepts traffic."""
+    prime_db()
+    for tenant_id in list_tenants():
+        get_tenant_state(tenant_id).leaderboard.sync() # Catch up on anything written since the master loaded
+
+def create_app():
+    """
+    Warms shared state and returns the module-level app. Not a factory: routes are
+    registered on `app` at import, so every call returns the same instance.
+    """
+    warm_shared_state()
+    return app
+
 if __name__ == '__main__':
     app.run(debug=True)
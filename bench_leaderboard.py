@@ -0,0 +1,81 @@
+"""
+Leaderboard benchmark on a scratch database.
+Usage: python bench_leaderboard.py [num_students] [scores_per_student]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+# Must be set before data_manager is imported so the real DB is never touched
+_scratch = tempfile.mkdtemp(prefix='leaderboard_bench_')
+os.environ['STUDY_DB_PATH'] = os.path.join(_scratch, 'bench.db')
+
+from data_manager import get_db_connection, update_progress, rebuild_leaderboard
+from syllabus_index import get_syllabus_index
+from leaderboard import Leaderboard
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))]
+    return f"p50={pick(0.50):.3f}ms p99={pick(0.99):.3f}ms"
+
+
+def seed(num_students, per_student, rng):
+    topic_ids = list(get_syllabus_index().topics) or ['t1']
+    conn = get_db_connection()
+    conn.executemany('INSERT INTO users (username, password, roll_number, name, email, role) VALUES (?, ?, ?, ?, ?, ?)',
+                     [(f"s{i}", "x", str(i), f"Student {i}", "", "student") for i in range(num_students)])
+    rows = []
+    for i in range(num_students):
+        skill = rng.random()
+        for tid in rng.sample(topic_ids, min(per_student, len(topic_ids))):
+            rows.append((f"s{i}", tid, sum(rng.random() < skill for _ in range(5)), 5, "seed"))
+    conn.executemany('INSERT INTO quiz_scores (username, topic_id, score, total, timestamp) VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return topic_ids
+
+
+def main():
+    num_students = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    per_student = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = random.Random(42)
+
+    topic_ids, ms = timed(seed, num_students, per_student, rng)
+    print(f"Seeded {num_students} students x {per_student} scores in {ms:.0f}ms")
+
+    rows, ms = timed(rebuild_leaderboard)
+    print(f"rebuild_leaderboard: {rows} rows in {ms:.0f}ms")
+
+    board = Leaderboard()
+    _, ms = timed(board.sync)
+    print(f"Cold sync (load rank trees): {ms:.0f}ms")
+
+    subject = get_syllabus_index().topic(topic_ids[0])
+    subject_id = subject['subject_id'] if subject else '_all'
+    users = [f"s{rng.randrange(num_students)}" for _ in range(2000)]
+
+    print("rank (overall):   ", percentiles([timed(board.rank, u)[1] for u in users]))
+    print("rank (subject):   ", percentiles([timed(board.rank, u, subject_id)[1] for u in users]))
+    print("top-10 (overall): ", percentiles([timed(board.top, '_all', 10)[1] for _ in range(500)]))
+
+    update_ms = []
+    for u in users[:500]:
+        value = {"score": rng.randint(0, 5), "total": 5}
+        update_ms.append(timed(update_progress, u, rng.choice(topic_ids), 'score', value)[1])
+    print("update_progress:  ", percentiles(update_ms))
+    _, ms = timed(board.sync)
+    print(f"Incremental sync after 500 updates: {ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Topic search benchmark on a synthetic syllabus (default 10k topics).
+Usage: python bench_search.py [num_topics] [num_queries]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+# Must be set before data_manager (imported by search_index) is loaded so the real DB is never touched
+_scratch = tempfile.mkdtemp(prefix='search_bench_')
+os.environ['STUDY_DATA_DIR'] = _scratch
+os.environ['STUDY_DB_PATH'] = os.path.join(_scratch, 'bench.db')
+
+from seed_data import build_syllabus
+from search_index import SearchIndex, tokenize
+from syllabus_index import SyllabusIndex
+
+SYLLABLES = ["al", "be", "co", "de", "ex", "fi", "ga", "hy", "in", "jo", "ka", "lo", "mi", "ne", "or",
+             "pa", "qu", "ra", "si", "to", "un", "ve", "wa", "xe", "yo", "ze", "tion", "ment", "ing", "ous"]
+SUBJECT_WORDS = ["Cloud", "Data", "Network", "Systems", "Learning", "Security", "Software", "Theory",
+                 "Computing", "Design", "Analysis", "Engineering", "Management", "Biology", "Markets"]
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(words) + SUBJECT_WORDS
+
+
+def synthetic_syllabus(num_topics, rng):
+    subjects = 20
+    units = 10
+    syllabus = build_syllabus(subjects, units, max(1, num_topics // (subjects * units)), rng)
+    vocab = vocabulary(rng, 3000)
+    # build_syllabus names are "Subject 1 Unit 1 Topic 1"; give them realistic, varied wording
+    for subj in syllabus['subjects']:
+        subj['name'] = ' '.join(rng.sample(SUBJECT_WORDS, 2))
+        for unit in subj['units']:
+            unit['name'] = ' '.join(rng.sample(vocab, 3))
+            for t in unit['topics']:
+                t['name'] = ' '.join(rng.sample(vocab, rng.randint(2, 4)))
+    return syllabus
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice('aeiourst') + word[i + 1:]
+
+
+def queries(index, rng, count):
+    names = [t['name'] for t in index.topics.values()]
+    out = {"prefix": [], "multi-word": [], "typo": [], "short": []}
+    for _ in range(count):
+        words = tokenize(rng.choice(names))
+        out["prefix"].append(words[0][:rng.randint(3, len(words[0]))])
+        out["multi-word"].append(' '.join(words[:2])[:-1])
+        out["typo"].append(typo(words[-1], rng))
+        out["short"].append(words[0][:2])
+    return out
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))]
+    return f"p50={pick(0.50):.3f}ms p99={pick(0.99):.3f}ms max={samples[-1]:.3f}ms"
+
+
+def main():
+    num_topics = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(42)
+
+    index = SyllabusIndex(synthetic_syllabus(num_topics, rng))
+    start = time.perf_counter()
+    search = SearchIndex(index, {"kb1": index.topic_name(next(iter(index.topics)))})
+    print(f"{len(index.topics)} topics, {len(search.words)} distinct words: "
+          f"built in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    for label, qs in queries(index, rng, num_queries).items():
+        timings, hits = [], 0
+        for q in qs:
+            start = time.perf_counter()
+            results = search.search(q)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += bool(results)
+        print(f"{label:11} {percentiles(timings)}  hit rate {hits / len(qs):.0%}")
+
+
+if __name__ == "__main__":
+    main()
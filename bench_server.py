@@ -0,0 +1,138 @@
+"""
+Load test: Flask dev server vs. the gunicorn pre-fork entrypoint.
+Reports requests/sec and per-process memory (RSS, plus PSS which counts shared
+copy-on-write pages fractionally). Linux only (reads /proc).
+
+Usage:
+    python seed_data.py --out /tmp/study_scale --students 2000
+    python bench_server.py --data /tmp/study_scale --seconds 15 --concurrency 8
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import subprocess
+import http.cookiejar
+import urllib.request
+import urllib.parse
+
+PATHS = ['/dashboard', '/analysis', '/learn/sub1_u1_t1', '/api/quiz?kind=topic&id=sub1_u1_t1']
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def login(base, username):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    data = urllib.parse.urlencode({'username': username, 'password': '1111'}).encode()
+    opener.open(base + '/auth/login', data=data, timeout=10)
+    return opener
+
+
+def drive(base, seconds, concurrency):
+    counts, errors = [0] * concurrency, [0] * concurrency
+    stop_at = time.time() + seconds
+
+    def worker(i):
+        opener = login(base, f"student{i}")
+        n = 0
+        while time.time() < stop_at:
+            try:
+                opener.open(base + PATHS[n % len(PATHS)], timeout=30).read()
+                counts[i] += 1
+            except Exception:
+                errors[i] += 1
+            n += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def process_tree(pid):
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+
+def memory_kb(pid):
+    rss = pss = 0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def run_server(name, cmd, env, base, seconds, concurrency):
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for(base + '/'):
+            print(f"{name}: server did not start")
+            return None
+        rps, errors = drive(base, seconds, concurrency)
+        procs = [(pid, *memory_kb(pid)) for pid in process_tree(proc.pid)]
+        print(f"\n{name}: {rps:.1f} req/s ({errors} errors)")
+        for pid, rss, pss in procs:
+            role = 'master' if pid == proc.pid else 'worker'
+            print(f"  {role:6} pid={pid:<7} RSS={rss / 1024:6.1f}MB PSS={pss / 1024:6.1f}MB")
+        return rps
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dev server and gunicorn throughput/memory.")
+    parser.add_argument('--data', required=True, help="Directory created by seed_data.py")
+    parser.add_argument('--seconds', type=int, default=15)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=0, help="gunicorn workers (default: Config.WEB_WORKERS)")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data)
+    env = dict(os.environ, STUDY_DATA_DIR=data_dir, STUDY_DB_PATH=os.path.join(data_dir, 'study_companion.db'))
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    dev_cmd = [sys.executable, '-c',
+               "from app import app; app.run(port=5055, debug=True, use_reloader=False)"]
+    run_server("dev server (app.run)", dev_cmd, env, 'http://127.0.0.1:5055', args.seconds, args.concurrency)
+
+    gunicorn_env = dict(env, WEB_BIND='127.0.0.1:5056')
+    if args.workers:
+        gunicorn_env['WEB_WORKERS'] = str(args.workers)
+    gunicorn_cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(here, 'gunicorn.conf.py'),
+                    '--chdir', here, 'wsgi:app']
+    run_server("gunicorn (wsgi.py)", gunicorn_cmd, gunicorn_env, 'http://127.0.0.1:5056', args.seconds, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Route benchmark suite. Drives the app through Flask's test client against a
+seeded scratch dataset (see seed_data.py) and saves results as JSON.
+
+Usage:
+    python seed_data.py --out /tmp/study_scale --students 5000
+    python benchmark.py --data /tmp/study_scale --requests 50
+    python benchmark.py --data /tmp/study_scale --compare bench_results/bench-old.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+class QueryCounter:
+    """Counts SQL statements by tracing every connection data_manager opens."""
+
+    def __init__(self, data_manager):
+        self.count = 0
+        original = data_manager.get_db_connection
+
+        def counted_connection():
+            conn = original()
+            conn.set_trace_callback(self._trace)
+            return conn
+
+        data_manager.get_db_connection = counted_connection
+
+    def _trace(self, statement):
+        self.count += 1
+
+
+def build_routes(syllabus, rng):
+    subject_ids = [s['id'] for s in syllabus.get('subjects', [])]
+    return {
+        "dashboard": ("student", lambda: "/dashboard"),
+        "analysis": ("student", lambda: "/analysis"),
+        # Exam pages are shells; the paper itself is assembled by /api/quiz
+        "subject_exam": ("student", lambda: f"/api/quiz?kind=subject&id={rng.choice(subject_ids)}"),
+        "mock_exam": ("student", lambda: "/api/quiz?kind=mock"),
+        "class_analytics": ("professor", lambda: "/professor/analytics"),
+    }
+
+
+def run(data_dir, num_requests, routes_filter=None, seed_value=7):
+    os.environ['STUDY_DATA_DIR'] = data_dir
+    os.environ['STUDY_DB_PATH'] = os.path.join(data_dir, 'study_companion.db')
+
+    import data_manager
+    counter = QueryCounter(data_manager)
+    from app import app, get_syllabus
+
+    rng = random.Random(seed_value)
+    conn = sqlite3.connect(os.environ['STUDY_DB_PATH'])
+    students = [r[0] for r in conn.execute("SELECT username FROM users WHERE role = 'student'")]
+    conn.close()
+    if not students:
+        sys.exit(f"No students in {data_dir}; run seed_data.py first.")
+
+    syllabus = get_syllabus()
+    routes = build_routes(syllabus, rng)
+    client = app.test_client()
+    results = {}
+
+    for name, (role, path_for) in routes.items():
+        if routes_filter and name not in routes_filter:
+            continue
+
+        def login():
+            with client.session_transaction() as sess:
+                if role == 'professor':
+                    sess['user'] = {'info_username': 'professor', 'name': 'Bench Professor', 'role': 'professor'}
+                else:
+                    username = rng.choice(students)
+                    sess['user'] = {'info_username': username, 'name': username, 'roll_number': '0', 'role': 'student'}
+
+        login()
+        client.get(path_for()) # Warm-up (template compile, syllabus index)
+
+        latencies, queries = [], []
+        for _ in range(num_requests):
+            login()
+            counter.count = 0
+            start = time.perf_counter()
+            resp = client.get(path_for())
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count)
+            if resp.status_code != 200:
+                print(f"  {name}: HTTP {resp.status_code}")
+
+        # Memory pass is separate so tracemalloc overhead doesn't skew latency
+        login()
+        tracemalloc.start()
+        client.get(path_for())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            "requests": num_requests,
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p90_ms": round(percentile(latencies, 0.90), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "max_ms": round(max(latencies), 3),
+            "queries_per_request": round(sum(queries) / len(queries), 1),
+            "peak_memory_kb": round(peak / 1024, 1)
+        }
+        r = results[name]
+        print(f"{name:16} p50={r['p50_ms']:8.2f}ms p99={r['p99_ms']:8.2f}ms "
+              f"queries={r['queries_per_request']:7.1f} peak={r['peak_memory_kb']:9.1f}KB")
+
+    topics = sum(len(u.get('topics', [])) for s in syllabus.get('subjects', []) for u in s.get('units', []))
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "data_dir": data_dir,
+            "students": len(students),
+            "subjects": len(syllabus.get('subjects', [])),
+            "topics": topics,
+            "python": platform.python_version()
+        },
+        "routes": results
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['meta']['timestamp']}):")
+    for name, r in current['routes'].items():
+        old = baseline['routes'].get(name)
+        if not old:
+            continue
+        change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+        print(f"{name:16} p50 {old['p50_ms']:8.2f} -> {r['p50_ms']:8.2f}ms ({change:+.0f}%) "
+              f"queries {old['queries_per_request']} -> {r['queries_per_request']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app routes against a seeded dataset.")
+    parser.add_argument('--data', required=True, help="Directory created by seed_data.py")
+    parser.add_argument('--requests', type=int, default=30, help="Requests per route")
+    parser.add_argument('--routes', nargs='*', help="Only run these routes")
+    parser.add_argument('--out', help="Result file (default: bench_results/bench-<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    results = run(os.path.abspath(args.data), args.requests, args.routes)
+
+    out = args.out or os.path.join('bench_results', f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
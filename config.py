@@ -5,3 +5,45 @@ class Config:
     # Optional: Add your OpenAI/Gemini API key here for real AI features
     # OPENAI_API_KEY = "sk-..." 
     AI_PROVIDER = "mock" # Options: "mock", "openai", "gemini"
+
+    # Production server (gunicorn.conf.py). Workers default to 2 x CPUs + 1.
+    WEB_BIND = os.environ.get('WEB_BIND') or '0.0.0.0:8000'
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS') or 0) or (os.cpu_count() or 1) * 2 + 1
+    WEB_THREADS = int(os.environ.get('WEB_THREADS') or 1)
+
+    # AI provider guard (provider_guard.py)
+    AI_RATE_PER_MINUTE = 60 # Match the provider quota; shared by all workers and precompute runs (one DB-backed bucket)
+    AI_BURST = 10
+    AI_FAILURE_THRESHOLD = 5 # Consecutive failures/timeouts before the circuit opens
+    AI_RESET_TIMEOUT = 30 # Seconds open before a half-open probe
+    AI_CALL_TIMEOUT = 10 # Seconds; request deadline passed to the provider, and slower calls count as failures
+    AI_BATCH_TOPICS = 10 # Topics per batched quiz prompt (subject/mock exams)
+
+    # Precomputed content (precompute.py). Runs in the background after a syllabus upload.
+    PRECOMPUTE_ON_UPLOAD = True
+    PRECOMPUTE_WORKERS = 4
+    PRECOMPUTE_RATE = 0.5 # Generations per second; stays under AI_RATE_PER_MINUTE so live traffic keeps headroom
+    PRECOMPUTE_BANK_SIZE = 10 # Questions stored per topic and difficulty
+    PRECOMPUTE_STALE_SECONDS = 600 # A run with no progress for this long is taken to have died
+
+    # Quiz answer keys (quiz_store.py): quizzes are graded server-side against these
+    QUIZ_KEY_TTL = 2 * 3600 # Seconds a quiz can stay open before its token expires
+    QUIZ_KEYS_PER_USER = 50 # Open quizzes per user; that user's oldest keys are evicted beyond this
+    QUIZ_GZIP_MIN_BYTES = 512 # /api/quiz responses smaller than this aren't worth compressing
+
+    # Multi-course tenancy (tenants.py). The tenant comes from this header (set it at the
+    # reverse proxy) or from <tenant>.TENANT_BASE_DOMAIN; otherwise the default tenant.
+    TENANT_HEADER = 'X-Tenant'
+    TENANT_BASE_DOMAIN = os.environ.get('TENANT_BASE_DOMAIN') # e.g. "study.example.edu"
+    TENANT_CONTENT_CACHE_BYTES = 16 * 1024 * 1024 # Per tenant; in-memory explanations/question banks
+
+    # Metrics (metrics.py). With a directory set, /metrics sums every process's snapshot there;
+    # gunicorn.conf.py sets one up so a scrape of any worker reports totals for all of them.
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_DUMP_INTERVAL = 1 # Seconds between a worker's snapshot writes
+
+    # SQL debugging (see query_debug.py). Off by default; adds per-request overhead.
+    QUERY_DEBUG = os.environ.get('QUERY_DEBUG') == '1'
+    QUERY_DEBUG_REPEAT_THRESHOLD = 10 # Same statement this many times in one request => likely N+1
+    SLOW_QUERY_MS = 50
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG') or 'slow_queries.log'
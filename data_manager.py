@@ -1,13 +1,78 @@
 import sqlite3
 import json
 import os
+import time
+import threading
 from datetime import datetime
+from scheduler import DEFAULT_EASE, quality_from_score, sm2_update, next_due, format_due
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-DB_PATH = os.path.join(DATA_DIR, 'study_companion.db')
+DATA_DIR = os.environ.get('STUDY_DATA_DIR') or os.path.join(os.path.dirname(__file__), 'data')
+DB_PATH = os.environ.get('STUDY_DB_PATH') or os.path.join(DATA_DIR, 'study_companion.db')
+
+# Leaderboard key for the all-subjects (overall) ranking
+OVERALL_BOARD = '_all'
+
+# Multi-course tenancy (see tenants.py). The default tenant keeps using DATA_DIR
+# itself, so single-course deployments are unchanged.
+DEFAULT_TENANT = 'default'
+TENANTS_DIR = os.path.join(DATA_DIR, 'tenants')
+
+def tenant_dir(tenant_id=DEFAULT_TENANT):
+    return DATA_DIR if tenant_id == DEFAULT_TENANT else os.path.join(TENANTS_DIR, tenant_id)
+
+# Callbacks run after every statement as listener(conn, sql, params, seconds).
+# Used by metrics.py; with no listeners registered the only cost is one tuple check.
+# Copy-on-write: add/remove swap in a new tuple, so a thread looping over the old one
+# in _notify never has a listener skipped by another thread's removal.
+QUERY_LISTENERS = ()
+_listeners_lock = threading.Lock()
+
+def add_query_listener(listener):
+    global QUERY_LISTENERS
+    with _listeners_lock:
+        if listener not in QUERY_LISTENERS:
+            QUERY_LISTENERS = QUERY_LISTENERS + (listener,)
+
+def remove_query_listener(listener):
+    global QUERY_LISTENERS
+    with _listeners_lock:
+        QUERY_LISTENERS = tuple(l for l in QUERY_LISTENERS if l != listener)
+
+def _notify(conn, sql, params, seconds):
+    for listener in QUERY_LISTENERS:
+        listener(conn, sql, params, seconds)
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        if not QUERY_LISTENERS:
+            return super().execute(sql, params)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _notify(self.connection, sql, params, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_params):
+        if not QUERY_LISTENERS:
+            return super().executemany(sql, seq_of_params)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            _notify(self.connection, sql, None, time.perf_counter() - start)
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, factory=TracedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -24,7 +89,8 @@ def init_db():
             roll_number TEXT,
             name TEXT,
             email TEXT,
-            role TEXT DEFAULT 'student'
+            role TEXT DEFAULT 'student',
+            tenant_id TEXT NOT NULL DEFAULT 'default'
         )
     ''')
     
@@ -34,6 +100,7 @@ def init_db():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT,
             topic_id TEXT,
+            tenant_id TEXT NOT NULL DEFAULT 'default',
             UNIQUE(username, topic_id)
         )
     ''')
@@ -47,24 +114,173 @@ def init_db():
             score INTEGER,
             total INTEGER,
             timestamp TEXT,
+            tenant_id TEXT NOT NULL DEFAULT 'default',
             UNIQUE(username, topic_id)
         )
     ''')
     
+    # Spaced Repetition Schedule (SM-2 state per student/topic)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS review_schedule (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            topic_id TEXT,
+            ease REAL,
+            interval_days INTEGER,
+            repetitions INTEGER,
+            due TEXT,
+            tenant_id TEXT NOT NULL DEFAULT 'default',
+            UNIQUE(username, topic_id)
+        )
+    ''')
+    
+    # Small key/value table for one-off maintenance flags
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    
+    # Leaderboard: per (student, subject) aggregates, kept incrementally by update_progress.
+    # seq is a global change counter so in-memory rank trees can catch up cheaply.
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard'")
+    leaderboard_existed = c.fetchone() is not None
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            subject_id TEXT,
+            score_sum INTEGER,
+            total_sum INTEGER,
+            percent REAL,
+            seq INTEGER,
+            tenant_id TEXT NOT NULL DEFAULT 'default',
+            UNIQUE(username, subject_id)
+        )
+    ''')
+    if not leaderboard_existed and c.execute('SELECT 1 FROM quiz_scores LIMIT 1').fetchone():
+        # Scores predate the leaderboard; the first Leaderboard.sync() backfills them
+        c.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('leaderboard_backfill', '1')")
+    
+    # Precomputed AI content (explanations and question banks), see precompute.py.
+    # Tenants may reuse topic ids, so the key includes tenant_id.
+    if 'content_cache' in _tables(c) and 'tenant_id' not in _columns(c, 'content_cache'):
+        c.execute('ALTER TABLE content_cache RENAME TO content_cache_old') # Recreated below with the new key
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS content_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id TEXT NOT NULL DEFAULT 'default',
+            topic_id TEXT,
+            kind TEXT,
+            difficulty TEXT,
+            topic_name TEXT,
+            payload TEXT,
+            created TEXT,
+            UNIQUE(tenant_id, topic_id, kind, difficulty)
+        )
+    ''')
+    if 'content_cache_old' in _tables(c):
+        c.execute('''
+            INSERT INTO content_cache (topic_id, kind, difficulty, topic_name, payload, created)
+            SELECT topic_id, kind, difficulty, topic_name, payload, created FROM content_cache_old
+        ''')
+        c.execute('DROP TABLE content_cache_old')
+    
+    # Precompute run state per tenant (precompute.py). In the DB so every gunicorn worker
+    # and the CLI see the same progress, and a second upload queues behind a running pass.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS precompute_runs (
+            tenant_id TEXT PRIMARY KEY,
+            running INTEGER DEFAULT 0,
+            queued INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            done INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            started REAL,
+            finished REAL,
+            heartbeat REAL
+        )
+    ''')
+    
+    # Shared AI provider rate limit / circuit breaker state (provider_guard.py), one row per guard
+    c.execute('CREATE TABLE IF NOT EXISTS guard_state (name TEXT PRIMARY KEY, state TEXT)')
+    
+    # Answer keys for issued quizzes (quiz_store.py). Bounded and expired on insert;
+    # kept in the DB rather than process memory so any gunicorn worker can grade.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_keys (
+            token TEXT PRIMARY KEY,
+            username TEXT,
+            topic_id TEXT,
+            answers TEXT,
+            created REAL,
+            tenant_id TEXT NOT NULL DEFAULT 'default'
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_quiz_keys_created ON quiz_keys (created)')
+    
+    # Tenant partitioning: databases created before tenancy get the column (rows
+    # land in the default tenant), then every tenant-wide query gets a composite index.
+    for table in ('users', 'topics_completed', 'quiz_scores', 'review_schedule', 'leaderboard', 'quiz_keys'):
+        if 'tenant_id' not in _columns(c, table):
+            c.execute(f"ALTER TABLE {table} ADD COLUMN tenant_id TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+    c.execute('DROP INDEX IF EXISTS idx_review_due')
+    c.execute('DROP INDEX IF EXISTS idx_leaderboard_rank')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_tenant ON users (tenant_id, role)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_topics_completed_tenant ON topics_completed (tenant_id, username)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_quiz_scores_tenant ON quiz_scores (tenant_id, username)')
+    # Due queue: lets "next topics to review" walk the index instead of scanning scores
+    c.execute('CREATE INDEX IF NOT EXISTS idx_review_due_tenant ON review_schedule (tenant_id, username, due)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_rank_tenant ON leaderboard (tenant_id, subject_id, percent)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_tenant_seq ON leaderboard (tenant_id, seq)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_quiz_keys_user ON quiz_keys (tenant_id, username, created)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_seq ON leaderboard (seq)') # MAX(seq) for new changes
+    
     # Seed default user if none exists
     c.execute('SELECT COUNT(*) FROM users')
     if c.fetchone()[0] == 0:
         c.execute('''
-            INSERT INTO users (username, password, roll_number, name, email)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO users (username, password, roll_number, name, email, role)
+            VALUES (?, ?, ?, ?, ?, ?)
         ''', ('student', '1111', '1001', 'Default Student', 'student@college.edu', 'student'))
     
     conn.commit()
     conn.close()
 
 
-def load_json(filename):
-    filepath = os.path.join(DATA_DIR, filename)
+def _tables(c):
+    return {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def _columns(c, table):
+    return {row[1] for row in c.execute(f'PRAGMA table_info({table})')}
+
+def get_meta(key):
+    conn = get_db_connection()
+    row = conn.execute('SELECT value FROM app_meta WHERE key = ?', (key,)).fetchone()
+    conn.close()
+    return row['value'] if row else None
+
+def enable_wal():
+    """WAL lets multiple worker processes read while one writes (persists in the DB file)."""
+    conn = get_db_connection()
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+
+def prime_db():
+    """
+    Read each table once so the DB file's pages are in the OS page cache before traffic
+    arrives. There is no connection pool (every call opens its own connection), so
+    this warms the file, not any connection that later requests reuse.
+    """
+    conn = get_db_connection()
+    for table in ('users', 'topics_completed', 'quiz_scores', 'review_schedule', 'leaderboard', 'content_cache',
+                  'quiz_keys'):
+        conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchall()
+    conn.close()
+
+def load_json(filename, tenant_id=DEFAULT_TENANT):
+    filepath = os.path.join(tenant_dir(tenant_id), filename)
     if not os.path.exists(filepath):
         return {}
     with open(filepath, 'r') as f:
@@ -73,16 +289,20 @@ def load_json(filename):
         except json.JSONDecodeError:
             return {}
 
-def save_json(filename, data):
-    filepath = os.path.join(DATA_DIR, filename)
+def save_json(filename, data, tenant_id=DEFAULT_TENANT):
+    os.makedirs(tenant_dir(tenant_id), exist_ok=True)
+    filepath = os.path.join(tenant_dir(tenant_id), filename)
     with open(filepath, 'w') as f:
         json.dump(data, f, indent=4)
 
-def create_user(username, password, roll_number, name, email, role='student'):
+def create_user(username, password, roll_number, name, email, role='student', tenant_id=DEFAULT_TENANT):
+    # Usernames stay globally unique: each account belongs to exactly one tenant
     conn = get_db_connection()
     try:
-        conn.execute('INSERT INTO users (username, password, roll_number, name, email, role) VALUES (?, ?, ?, ?, ?, ?)',
-                     (username, password, roll_number, name, email, role))
+        conn.execute('''
+            INSERT INTO users (username, password, roll_number, name, email, role, tenant_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (username, password, roll_number, name, email, role, tenant_id))
         conn.commit()
         return True
     except sqlite3.IntegrityError:
@@ -90,21 +310,23 @@ def create_user(username, password, roll_number, name, email, role='student'):
     finally:
         conn.close()
 
-def check_user(username, password):
+def check_user(username, password, tenant_id=DEFAULT_TENANT):
     conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE username = ? AND password = ?', 
-                        (username, password)).fetchone()
+    user = conn.execute('SELECT * FROM users WHERE username = ? AND password = ? AND tenant_id = ?', 
+                        (username, password, tenant_id)).fetchone()
     conn.close()
     if user:
         return dict(user)
     return None
 
-def get_student_progress(username):
+def get_student_progress(username, tenant_id=DEFAULT_TENANT):
     conn = get_db_connection()
-    completed_rows = conn.execute('SELECT topic_id FROM topics_completed WHERE username = ?', (username,)).fetchall()
+    completed_rows = conn.execute('SELECT topic_id FROM topics_completed WHERE tenant_id = ? AND username = ?',
+                                  (tenant_id, username)).fetchall()
     topics_completed = [row['topic_id'] for row in completed_rows]
     
-    score_rows = conn.execute('SELECT topic_id, score, total, timestamp FROM quiz_scores WHERE username = ?', (username,)).fetchall()
+    score_rows = conn.execute('SELECT topic_id, score, total, timestamp FROM quiz_scores WHERE tenant_id = ? AND username = ?',
+                              (tenant_id, username)).fetchall()
     quiz_scores = {}
     for row in score_rows:
         quiz_scores[row['topic_id']] = {
@@ -121,30 +343,301 @@ def get_student_progress(username):
         "test_history": []
     }
 
-def update_progress(username, topic_id, data_type, value):
+def update_progress(username, topic_id, data_type, value, tenant_id=DEFAULT_TENANT):
     conn = get_db_connection()
     if data_type == 'complete':
-        conn.execute('INSERT OR IGNORE INTO topics_completed (username, topic_id) VALUES (?, ?)', 
-                     (username, topic_id))
+        conn.execute('INSERT OR IGNORE INTO topics_completed (username, topic_id, tenant_id) VALUES (?, ?, ?)', 
+                     (username, topic_id, tenant_id))
     elif data_type == 'score':
+        old = conn.execute('SELECT score, total FROM quiz_scores WHERE tenant_id = ? AND username = ? AND topic_id = ?',
+                           (tenant_id, username, topic_id)).fetchone()
         conn.execute('''
-            INSERT OR REPLACE INTO quiz_scores (username, topic_id, score, total, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (username, topic_id, value['score'], value['total'], value.get('timestamp', str(datetime.now()))))
+            INSERT OR REPLACE INTO quiz_scores (username, topic_id, score, total, timestamp, tenant_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (username, topic_id, value['score'], value['total'], value.get('timestamp', str(datetime.now())),
+              tenant_id))
+        
+        # A retake replaces the old score, so the leaderboard gets the difference
+        d_score = (value['score'] or 0) - ((old['score'] or 0) if old else 0)
+        d_total = (value['total'] or 0) - ((old['total'] or 0) if old else 0)
+        if d_score or d_total:
+            for board in leaderboard_subjects(topic_id, tenant_id=tenant_id):
+                _apply_leaderboard_delta(conn, username, board, d_score, d_total, tenant_id)
     conn.commit()
     conn.close()
 
-def get_class_analytics():
+# --- Precomputed Content ---
+
+def save_content(topic_id, kind, difficulty, topic_name, payload, tenant_id=DEFAULT_TENANT):
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT OR REPLACE INTO content_cache (tenant_id, topic_id, kind, difficulty, topic_name, payload, created)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (tenant_id, topic_id, kind, difficulty, topic_name, json.dumps(payload), str(datetime.now())))
+    conn.commit()
+    conn.close()
+
+def get_content(topic_id, kind, difficulty='', tenant_id=DEFAULT_TENANT, topic_name=None):
+    """Stored payload, or None. With topic_name, a row generated for a different name (id reused) misses."""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT payload, topic_name FROM content_cache
+        WHERE tenant_id = ? AND topic_id = ? AND kind = ? AND difficulty = ?
+    ''', (tenant_id, topic_id, kind, difficulty)).fetchone()
+    conn.close()
+    if not row or (topic_name is not None and row['topic_name'] != topic_name):
+        return None
+    return json.loads(row['payload'])
+
+def get_content_keys(tenant_id=DEFAULT_TENANT):
+    """(topic_id, kind, difficulty) -> topic_name for everything already precomputed."""
+    conn = get_db_connection()
+    rows = conn.execute('SELECT topic_id, kind, difficulty, topic_name FROM content_cache WHERE tenant_id = ?',
+                        (tenant_id,)).fetchall()
+    conn.close()
+    return {(r['topic_id'], r['kind'], r['difficulty']): r['topic_name'] for r in rows}
+
+# --- Shared Provider Guard State ---
+
+def update_guard_state(name, apply):
+    """
+    Read-modify-write of a guard's state in one IMMEDIATE transaction, so processes
+    never interleave. apply(state dict or None) returns (result, new state); returns result.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('SELECT state FROM guard_state WHERE name = ?', (name,)).fetchone()
+        result, state = apply(json.loads(row['state']) if row else None)
+        conn.execute('INSERT OR REPLACE INTO guard_state (name, state) VALUES (?, ?)', (name, json.dumps(state)))
+        conn.commit()
+    finally:
+        conn.close()
+    return result
+
+# --- Precompute Runs ---
+
+def claim_precompute_run(tenant_id=DEFAULT_TENANT, stale_after=600):
+    """
+    Mark a precompute run as started, or, if another process is running one (heartbeat
+    within stale_after seconds), queue a follow-up for it. True when the caller may run.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    conn.execute('BEGIN IMMEDIATE') # Serialises claim/finish across processes
+    conn.execute('INSERT OR IGNORE INTO precompute_runs (tenant_id) VALUES (?)', (tenant_id,))
+    claimed = conn.execute('''
+        UPDATE precompute_runs SET running = 1, queued = 0, heartbeat = ?
+        WHERE tenant_id = ? AND (running = 0 OR heartbeat < ?)
+    ''', (now, tenant_id, now - stale_after)).rowcount == 1
+    if not claimed:
+        conn.execute('UPDATE precompute_runs SET queued = 1 WHERE tenant_id = ?', (tenant_id,))
+    conn.commit()
+    conn.close()
+    return claimed
+
+def finish_precompute_run(tenant_id=DEFAULT_TENANT):
+    """End a pass. True if a follow-up was queued meanwhile: the caller keeps the claim and runs again."""
+    conn = get_db_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    row = conn.execute('SELECT queued FROM precompute_runs WHERE tenant_id = ?', (tenant_id,)).fetchone()
+    again = bool(row and row['queued'])
+    if again:
+        conn.execute('UPDATE precompute_runs SET queued = 0, heartbeat = ? WHERE tenant_id = ?', (time.time(), tenant_id))
+    else:
+        conn.execute('UPDATE precompute_runs SET running = 0, finished = ? WHERE tenant_id = ?', (time.time(), tenant_id))
+    conn.commit()
+    conn.close()
+    return again
+
+def update_precompute_run(tenant_id=DEFAULT_TENANT, **fields):
+    """Set run fields (progress counters, times, running); also refreshes the heartbeat."""
+    fields['heartbeat'] = time.time()
+    columns = ', '.join(f'{name} = ?' for name in fields) # Names come from precompute.py, not user input
+    conn = get_db_connection()
+    conn.execute(f'UPDATE precompute_runs SET {columns} WHERE tenant_id = ?', (*fields.values(), tenant_id))
+    conn.commit()
+    conn.close()
+
+def get_precompute_run(tenant_id=DEFAULT_TENANT):
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT running, queued, total, done, errors, started, finished FROM precompute_runs WHERE tenant_id = ?
+    ''', (tenant_id,)).fetchone()
+    conn.close()
+    if not row:
+        return {"running": False, "queued": False, "total": 0, "done": 0, "errors": 0, "started": None, "finished": None}
+    return dict(row, running=bool(row['running']), queued=bool(row['queued']))
+
+# --- Quiz Answer Keys ---
+
+def save_quiz_key(token, username, topic_id, answers, ttl, per_user, tenant_id=DEFAULT_TENANT):
+    now = time.time()
+    conn = get_db_connection()
+    conn.execute('DELETE FROM quiz_keys WHERE created < ?', (now - ttl,))
+    conn.execute('''
+        INSERT INTO quiz_keys (token, username, topic_id, answers, created, tenant_id) VALUES (?, ?, ?, ?, ?, ?)
+    ''', (token, username, topic_id, json.dumps(answers), now, tenant_id))
+    # Capped per user, so one client opening quiz after quiz only evicts its own keys
+    conn.execute('''
+        DELETE FROM quiz_keys WHERE token IN (
+            SELECT token FROM quiz_keys WHERE tenant_id = ? AND username = ?
+            ORDER BY created DESC LIMIT -1 OFFSET ?)
+    ''', (tenant_id, username, per_user))
+    conn.commit()
+    conn.close()
+
+def take_quiz_key(token, username, ttl, tenant_id=DEFAULT_TENANT):
+    """
+    Remove and return an unexpired answer key (single use), or None. Only the user
+    and tenant it was issued to can take it; anyone else leaves it in place.
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT topic_id, answers, created FROM quiz_keys WHERE token = ? AND username = ? AND tenant_id = ?
+    ''', (token, username, tenant_id)).fetchone()
+    # rowcount guards against a concurrent submit of the same token taking it first
+    taken = row is not None and conn.execute('DELETE FROM quiz_keys WHERE token = ?', (token,)).rowcount == 1
+    conn.commit()
+    conn.close()
+    if not taken or row['created'] < time.time() - ttl:
+        return None
+    return {"topic_id": row['topic_id'], "answers": json.loads(row['answers'])}
+
+# --- Leaderboard ---
+
+def leaderboard_subjects(topic_id, index=None, tenant_id=DEFAULT_TENANT):
+    """Boards a score for topic_id counts towards: overall plus its subject."""
+    if index is None:
+        from syllabus_index import get_syllabus_index
+        index = get_syllabus_index(tenant_id)
+    boards = [OVERALL_BOARD]
+    topic = index.topic(topic_id)
+    if topic:
+        boards.append(topic['subject_id'])
+    elif topic_id in index.subjects: # Subject exam scores are stored under the subject id
+        boards.append(topic_id)
+    return boards
+
+def _apply_leaderboard_delta(conn, username, subject_id, d_score, d_total, tenant_id=DEFAULT_TENANT):
+    percent = (d_score / d_total * 100) if d_total > 0 else 0
+    conn.execute('''
+        INSERT INTO leaderboard (username, subject_id, score_sum, total_sum, percent, seq, tenant_id)
+        VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM leaderboard), ?)
+        ON CONFLICT(username, subject_id) DO UPDATE SET
+            score_sum = score_sum + excluded.score_sum,
+            total_sum = total_sum + excluded.total_sum,
+            percent = CASE WHEN total_sum + excluded.total_sum > 0
+                           THEN 100.0 * (score_sum + excluded.score_sum) / (total_sum + excluded.total_sum)
+                           ELSE 0 END,
+            seq = excluded.seq
+    ''', (username, subject_id, d_score, d_total, percent, tenant_id))
+
+def get_leaderboard_changes(since_seq, tenant_id=DEFAULT_TENANT):
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT username, subject_id, total_sum, percent, seq FROM leaderboard
+        WHERE tenant_id = ? AND seq > ? ORDER BY seq
+    ''', (tenant_id, since_seq)).fetchall()
+    conn.close()
+    return rows
+
+def get_leaderboard_top(subject_id=OVERALL_BOARD, limit=10, tenant_id=DEFAULT_TENANT):
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT l.username, u.name, u.roll_number, l.score_sum, l.total_sum, l.percent
+        FROM leaderboard l JOIN users u ON u.username = l.username
+        WHERE l.tenant_id = ? AND l.subject_id = ? AND l.total_sum > 0
+        ORDER BY l.percent DESC LIMIT ?
+    ''', (tenant_id, subject_id, limit)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def rebuild_leaderboard(tenant_id=None):
+    """Recompute leaderboard rows from quiz_scores (consistency repair); all tenants when tenant_id is None."""
+    from syllabus_index import get_syllabus_index
+    conn = get_db_connection()
+    if tenant_id is None:
+        tenants = [r[0] for r in conn.execute('SELECT tenant_id FROM quiz_scores UNION SELECT tenant_id FROM leaderboard')]
+    else:
+        tenants = [tenant_id]
+    
+    rows = []
+    seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM leaderboard').fetchone()[0]
+    for tenant in tenants:
+        index = get_syllabus_index(tenant)
+        totals = {}
+        for row in conn.execute('SELECT username, topic_id, score, total FROM quiz_scores WHERE tenant_id = ?', (tenant,)):
+            for board in leaderboard_subjects(row['topic_id'], index):
+                agg = totals.setdefault((row['username'], board), [0, 0])
+                agg[0] += row['score'] or 0
+                agg[1] += row['total'] or 0
+        
+        # Rows that no longer have any scores are zeroed rather than deleted, and every
+        # row gets a fresh seq, so running processes pick up the rebuild on their next sync.
+        for row in conn.execute('SELECT username, subject_id FROM leaderboard WHERE tenant_id = ?', (tenant,)):
+            totals.setdefault((row['username'], row['subject_id']), [0, 0])
+        
+        for (username, subject_id), (score_sum, total_sum) in totals.items():
+            seq += 1
+            percent = (score_sum / total_sum * 100) if total_sum > 0 else 0
+            rows.append((username, subject_id, score_sum, total_sum, percent, seq, tenant))
+    conn.executemany('''
+        INSERT OR REPLACE INTO leaderboard (username, subject_id, score_sum, total_sum, percent, seq, tenant_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    if tenant_id is None:
+        conn.execute("DELETE FROM app_meta WHERE key = 'leaderboard_backfill'")
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+def update_review_schedule(username, topic_id, score, total, now=None, tenant_id=DEFAULT_TENANT):
+    """Apply one SM-2 review step for a quiz result and reschedule the topic."""
+    now = now or datetime.now()
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT ease, interval_days, repetitions FROM review_schedule WHERE tenant_id = ? AND username = ? AND topic_id = ?
+    ''', (tenant_id, username, topic_id)).fetchone()
+    if row:
+        ease, interval, reps = row['ease'], row['interval_days'], row['repetitions']
+    else:
+        ease, interval, reps = DEFAULT_EASE, 0, 0
+    
+    ease, interval, reps = sm2_update(ease, interval, reps, quality_from_score(score, total))
+    conn.execute('''
+        INSERT OR REPLACE INTO review_schedule (username, topic_id, ease, interval_days, repetitions, due, tenant_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (username, topic_id, ease, interval, reps, next_due(interval, now), tenant_id))
+    conn.commit()
+    conn.close()
+
+def get_due_reviews(username, limit=5, now=None, tenant_id=DEFAULT_TENANT):
+    """Topics whose review is due, most overdue first (served from idx_review_due_tenant)."""
+    now = format_due(now or datetime.now())
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT topic_id, ease, interval_days, repetitions, due FROM review_schedule
+        WHERE tenant_id = ? AND username = ? AND due <= ?
+        ORDER BY due LIMIT ?
+    ''', (tenant_id, username, now, limit)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_class_analytics(tenant_id=DEFAULT_TENANT):
     conn = get_db_connection()
     # Get all students and their scores
-    students = conn.execute("SELECT username, name, roll_number FROM users WHERE role = 'student'").fetchall()
+    students = conn.execute("SELECT username, name, roll_number FROM users WHERE tenant_id = ? AND role = 'student'",
+                            (tenant_id,)).fetchall()
     
     analytics = []
     for std in students:
         username = std['username']
-        scores = conn.execute('SELECT topic_id, score, total FROM quiz_scores WHERE username = ?', (username,)).fetchall()
+        scores = conn.execute('SELECT topic_id, score, total FROM quiz_scores WHERE tenant_id = ? AND username = ?',
+                              (tenant_id, username)).fetchall()
         
-        comp_count = conn.execute('SELECT COUNT(*) FROM topics_completed WHERE username = ?', (username,)).fetchone()[0]
+        comp_count = conn.execute('SELECT COUNT(*) FROM topics_completed WHERE tenant_id = ? AND username = ?',
+                                  (tenant_id, username)).fetchone()[0]
         
         total_score = sum(s['score'] for s in scores)
         total_possible = sum(s['total'] for s in scores)
@@ -0,0 +1,96 @@
+"""
+Near-duplicate question detection with MinHash signatures and an LSH index.
+
+Question text is normalised (lower-cased, topic name masked so the same template
+asked about two topics counts as a repeat), split into word 3-gram shingles and
+reduced to a NUM_PERM-value MinHash signature. LSH buckets the signature by bands,
+so checking a new question only compares it against colliding candidates.
+"""
+import re
+import zlib
+import random
+import struct
+from array import array
+from functools import lru_cache
+
+NUM_PERM = 64
+BANDS = 16 # 16 bands x 4 rows: pairs above ~0.5 Jaccard almost always collide
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.7
+SIGNATURE_CACHE_SIZE = 20000 # ~512 bytes per entry
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1) # Fixed so signatures are stable across processes
+_PERMS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+_WORDS = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text, topic_name=None):
+    text = text.lower()
+    if topic_name:
+        text = text.replace(topic_name.lower(), ' topic ')
+    return ' '.join(_WORDS.findall(text))
+
+
+def shingles(normalized, k=3):
+    words = normalized.split()
+    if len(words) <= k:
+        return {normalized}
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+@lru_cache(maxsize=SIGNATURE_CACHE_SIZE)
+def signature(normalized):
+    """Packed MinHash signature (bytes), cached per distinct normalised text."""
+    hashes = [zlib.crc32(s.encode()) for s in shingles(normalized)]
+    mins = [min(((a * h + b) % _MERSENNE) & _MAX_HASH for h in hashes) for a, b in _PERMS]
+    return struct.pack(f'{NUM_PERM}I', *mins)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    a, b = array('I', sig_a), array('I', sig_b)
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class LSHIndex:
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(BANDS)]
+        self.signatures = {}
+
+    def _bands(self, sig):
+        width = ROWS * 4 # bytes per band
+        return (sig[i * width:(i + 1) * width] for i in range(BANDS))
+
+    def find_similar(self, sig):
+        """Key of an indexed entry at or above the threshold, or None."""
+        seen = set()
+        for band, key in zip(self.buckets, self._bands(sig)):
+            for candidate in band.get(key, ()):
+                if candidate not in seen:
+                    seen.add(candidate)
+                    if similarity(sig, self.signatures[candidate]) >= self.threshold:
+                        return candidate
+        return None
+
+    def insert(self, key, sig):
+        self.signatures[key] = sig
+        for band, band_key in zip(self.buckets, self._bands(sig)):
+            band.setdefault(band_key, []).append(key)
+
+
+class QuestionDeduper:
+    """Accepts questions one at a time, rejecting near-duplicates of ones already accepted."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.index = LSHIndex(threshold)
+
+    def add(self, question_text, topic_name=None, force=False):
+        """Index the question unless it near-duplicates an accepted one; force indexes it regardless."""
+        sig = signature(normalize(question_text, topic_name))
+        if not force and self.index.find_similar(sig) is not None:
+            return False
+        self.index.insert(len(self.index.signatures), sig)
+        return True
@@ -0,0 +1,36 @@
+# Gunicorn settings. Usage: gunicorn -c gunicorn.conf.py wsgi:app
+import gc
+import os
+import glob
+import tempfile
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+
+# Load the app (syllabus index, AIEngine KB, leaderboard trees, compiled templates)
+# in the master so workers inherit it copy-on-write instead of each building a copy.
+preload_app = True
+
+# Workers are separate processes with their own in-memory metrics; /metrics sums the
+# snapshots they write here (see metrics.py). Set before the app is loaded so workers inherit it.
+if not Config.METRICS_DIR:
+    Config.METRICS_DIR = tempfile.mkdtemp(prefix='study_metrics_')
+
+
+def on_starting(server):
+    # Snapshots left by a previous run's workers would otherwise be added to this run's totals
+    for path in glob.glob(os.path.join(Config.METRICS_DIR, '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the GC's reach; otherwise the first
+    # collection in each worker touches every object and un-shares its pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from app import warm_worker
+    warm_worker()
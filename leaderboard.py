@@ -0,0 +1,108 @@
+import sys
+import threading
+from data_manager import OVERALL_BOARD, DEFAULT_TENANT, get_leaderboard_changes, get_leaderboard_top, rebuild_leaderboard, get_meta
+
+# Scores are ranked at 0.1% resolution, so each board is a fixed-size tree
+BUCKETS = 1001
+
+
+def _bucket(percent):
+    return max(0, min(BUCKETS - 1, int(round(percent * 10))))
+
+
+class _RankTree:
+    """Fenwick tree of student counts per score bucket: O(log B) add and rank."""
+
+    def __init__(self):
+        self.tree = [0] * (BUCKETS + 1)
+        self.count = 0
+
+    def add(self, bucket, delta):
+        self.count += delta
+        i = bucket + 1
+        while i <= BUCKETS:
+            self.tree[i] += delta
+            i += i & -i
+
+    def count_upto(self, bucket):
+        """Number of students in buckets <= bucket."""
+        total = 0
+        i = bucket + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class Leaderboard:
+    """
+    In-memory rank trees mirroring one tenant's rows of the leaderboard table.
+    update_progress keeps the table current; sync() replays only rows whose
+    seq moved since the last call, so every process stays consistent.
+    """
+
+    def __init__(self, tenant_id=DEFAULT_TENANT):
+        self.tenant_id = tenant_id
+        self._trees = {}    # subject_id -> _RankTree
+        self._buckets = {}  # (subject_id, username) -> bucket
+        self._seq = 0
+        self._bootstrapped = False
+        self._lock = threading.Lock()
+
+    def sync(self):
+        with self._lock:
+            if not self._bootstrapped:
+                if get_meta('leaderboard_backfill'):
+                    rebuild_leaderboard()
+                self._bootstrapped = True
+            rows = get_leaderboard_changes(self._seq, self.tenant_id)
+
+            for row in rows:
+                key = (row['subject_id'], row['username'])
+                tree = self._trees.setdefault(row['subject_id'], _RankTree())
+                old = self._buckets.pop(key, None)
+                if old is not None:
+                    tree.add(old, -1)
+                if row['total_sum'] > 0:
+                    new = _bucket(row['percent'])
+                    self._buckets[key] = new
+                    tree.add(new, 1)
+                self._seq = row['seq']
+
+    def rank(self, username, subject_id=OVERALL_BOARD):
+        """Competition rank (1 = best) and percentile of a student, or None if unranked."""
+        self.sync()
+        with self._lock:
+            bucket = self._buckets.get((subject_id, username))
+            if bucket is None:
+                return None
+            tree = self._trees[subject_id]
+            at_or_below = tree.count_upto(bucket)
+            below = tree.count_upto(bucket - 1) if bucket > 0 else 0
+            n = tree.count
+
+        return {
+            "rank": n - at_or_below + 1,
+            "of": n,
+            "percent": bucket / 10,
+            "percentile": int((below + (at_or_below - below) / 2) / n * 100)
+        }
+
+    def top(self, subject_id=OVERALL_BOARD, limit=10):
+        """Top-N straight off the (subject_id, percent) index."""
+        self.sync()
+        rows = get_leaderboard_top(subject_id, limit, self.tenant_id)
+        rank = 0
+        for i, row in enumerate(rows):
+            if i == 0 or _bucket(row['percent']) != _bucket(rows[i - 1]['percent']):
+                rank = i + 1
+            row['rank'] = rank
+        return rows
+
+
+if __name__ == '__main__':
+    # Consistency repair: python leaderboard.py rebuild
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        print(f"Rebuilt {rebuild_leaderboard()} leaderboard rows.")
+    else:
+        print("Usage: python leaderboard.py rebuild")
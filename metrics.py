@@ -0,0 +1,267 @@
+"""
+Lightweight Prometheus instrumentation (no external client library).
+Call init_app(app) once; metrics are exposed as text at /metrics.
+
+Metrics live in process memory. Under gunicorn (several worker processes) set
+Config.METRICS_DIR (gunicorn.conf.py does): each worker then writes a snapshot of
+its metrics to <METRICS_DIR>/<pid>.json at most every METRICS_DUMP_INTERVAL seconds,
+and /metrics serves the sum over all snapshot files, so any worker answers a scrape
+with the same totals. Counters and histograms of exited workers are kept (totals
+never go backwards); gauges only come from live workers.
+"""
+import os
+import json
+import time
+import threading
+from config import Config
+from flask import g, request, has_request_context, before_render_template, template_rendered, Response
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Metric types ---
+
+def _label_str(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, doc, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(values), v] for values, v in self._values.items()]
+
+    def merge(self, snapshot, live=True):
+        for values, v in snapshot:
+            self.inc(*values, amount=v)
+
+    def empty(self):
+        return Counter(self.name, self.doc, self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, values)} {v}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, doc):
+        self.name, self.doc = name, doc
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+    def merge(self, snapshot, live=True):
+        # A point-in-time value: exited workers don't count, live ones report the worst case
+        if live:
+            self.value = max(self.value, snapshot)
+
+    def empty(self):
+        return Gauge(self.name, self.doc)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+class Histogram:
+    def __init__(self, name, doc, buckets, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(values), list(series)] for values, series in self._series.items()]
+
+    def merge(self, snapshot, live=True):
+        with self._lock:
+            for values, series in snapshot:
+                mine = self._series.setdefault(tuple(values), [0] * (len(self.buckets) + 2))
+                for i, n in enumerate(series):
+                    mine[i] += n
+
+    def empty(self):
+        return Histogram(self.name, self.doc, self.buckets, self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_label_str(names, values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_str(names, values + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, values)} {series[-1]}")
+        return lines
+
+
+# --- Registry ---
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+AI_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route.',
+                            LATENCY_BUCKETS, ('endpoint', 'method', 'status'))
+REQUEST_SQL_QUERIES = Histogram('http_request_sql_queries', 'SQL statements executed per request.',
+                                SQL_COUNT_BUCKETS, ('endpoint',))
+REQUEST_SQL_TIME = Histogram('http_request_sql_seconds', 'Total SQL time per request.',
+                             SQL_TIME_BUCKETS, ('endpoint',))
+SQL_QUERIES = Counter('sql_queries_total', 'SQL statements executed (including outside requests).')
+TEMPLATE_RENDER = Histogram('template_render_seconds', 'Jinja template render time.',
+                            LATENCY_BUCKETS, ('template',))
+AI_CALLS = Histogram('ai_provider_call_seconds', 'AI provider call latency.',
+                     AI_BUCKETS, ('operation', 'outcome'))
+AI_REQUESTS = Counter('ai_requests_total',
+                      'AIEngine requests by content source (provider, kb, fallback after a failed call, offline).',
+                      ('operation', 'source'))
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_SQL_QUERIES, REQUEST_SQL_TIME, SQL_QUERIES,
+            TEMPLATE_RENDER, AI_CALLS, AI_REQUESTS]
+
+
+def render():
+    registry = _merged_registry() if Config.METRICS_DIR else REGISTRY
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- Multi-process aggregation (see module docstring) ---
+_last_dump = 0.0
+
+
+def dump(force=False):
+    """Write this process's snapshot to METRICS_DIR (throttled unless forced)."""
+    global _last_dump
+    now = time.monotonic()
+    if not Config.METRICS_DIR or (not force and now - _last_dump < Config.METRICS_DUMP_INTERVAL):
+        return
+    _last_dump = now
+    path = os.path.join(Config.METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + '.tmp', 'w') as f:
+        json.dump({m.name: m.snapshot() for m in REGISTRY}, f)
+    os.replace(path + '.tmp', path) # Readers never see a half-written file
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged_registry():
+    dump(force=True)
+    merged = [m.empty() for m in REGISTRY]
+    for name in os.listdir(Config.METRICS_DIR):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(Config.METRICS_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        live = _alive(int(name[:-len('.json')]))
+        for metric in merged:
+            if metric.name in snapshot:
+                metric.merge(snapshot[metric.name], live)
+    return merged
+
+
+# --- Hooks used by data_manager and ai_engine ---
+
+def observe_query(conn, sql, params, seconds):
+    SQL_QUERIES.inc()
+    if has_request_context():
+        g._sql_count = g.get('_sql_count', 0) + 1
+        g._sql_time = g.get('_sql_time', 0.0) + seconds
+
+
+def observe_ai_call(operation, seconds, ok):
+    AI_CALLS.observe(seconds, operation, 'ok' if ok else 'error')
+
+
+def count_ai_request(operation, source):
+    AI_REQUESTS.inc(operation, source)
+
+
+# --- Flask wiring ---
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def init_app(app):
+    from data_manager import add_query_listener
+    add_query_listener(observe_query)
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+        g._sql_count = 0
+        g._sql_time = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get('_request_start')
+        if start is not None and request.endpoint != 'metrics':
+            endpoint = _endpoint()
+            REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+            REQUEST_SQL_QUERIES.observe(g.get('_sql_count', 0), endpoint)
+            REQUEST_SQL_TIME.observe(g.get('_sql_time', 0.0), endpoint)
+        dump()
+        return response
+
+    def _template_start(sender, template, context, **extra):
+        g.setdefault('_template_starts', []).append(time.perf_counter())
+
+    def _template_done(sender, template, context, **extra):
+        starts = g.get('_template_starts')
+        if starts:
+            TEMPLATE_RENDER.observe(time.perf_counter() - starts.pop(), template.name or 'inline')
+
+    before_render_template.connect(_template_start, app, weak=False)
+    template_rendered.connect(_template_done, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,160 @@
+"""
+Offline precomputation of topic explanations and question banks.
+Walks every syllabus topic x difficulty, generates content with a worker pool and
+stores it in content_cache so routes never pay generation cost on first view.
+
+Resumable: entries already stored for the same topic name are skipped. Content the
+engine only produced as a fallback (provider failed, or the guard rejected the call)
+is never stored: the job counts as an error and the next run retries it.
+Usage: python precompute.py [--workers 4] [--rate 5] [--bank-size 10] [--provider mock] [--force] [--tenant default]
+"""
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import Config
+from provider_guard import TokenBucket
+from dedup import QuestionDeduper
+from data_manager import DEFAULT_TENANT, save_content, get_content_keys
+from data_manager import claim_precompute_run, finish_precompute_run, update_precompute_run, get_precompute_run
+from syllabus_index import get_syllabus_index
+
+DIFFICULTIES = ["Easy", "Moderate", "Hard"]
+
+
+def build_jobs(index, force=False, tenant_id=DEFAULT_TENANT):
+    done = {} if force else get_content_keys(tenant_id)
+    jobs = []
+    for t in index.topics.values():
+        wanted = [('explanation', '')] + [('quiz_bank', d) for d in DIFFICULTIES]
+        for kind, difficulty in wanted:
+            # Same id but a renamed topic (new syllabus upload) is regenerated
+            if done.get((t['id'], kind, difficulty)) != t['name']:
+                jobs.append((t['id'], t['name'], kind, difficulty))
+    return jobs
+
+
+class FallbackContent(Exception):
+    """The engine fell back to KB/mock content because the provider was unavailable."""
+
+
+def _run_job(engine, job, bank_size, tenant_id=DEFAULT_TENANT):
+    topic_id, topic_name, kind, difficulty = job
+    if kind == 'explanation':
+        payload, source = engine.explanation_with_source(topic_name)
+    else:
+        # Over-generate, then keep the first bank_size questions that aren't near-duplicates
+        deduper = QuestionDeduper()
+        candidates, source = engine.quiz_with_source(topic_name, difficulty, num_questions=bank_size * 2)
+        payload = [q for q in candidates if deduper.add(q['question'], topic_name)][:bank_size]
+        for i, q in enumerate(payload):
+            q['id'] = i + 1
+    if source == 'fallback':
+        raise FallbackContent("provider unavailable, not storing fallback content")
+    save_content(topic_id, kind, difficulty, topic_name, payload, tenant_id)
+
+
+# --- Run state per tenant, kept in the DB (read by /professor/precompute_status) ---
+# Under gunicorn the upload, the status polls and the background thread can all be in
+# different worker processes, and the CLI is another process again.
+
+def precompute_status(tenant_id=DEFAULT_TENANT):
+    return get_precompute_run(tenant_id)
+
+
+def run_precompute(engine=None, workers=Config.PRECOMPUTE_WORKERS, rate=Config.PRECOMPUTE_RATE,
+                   bank_size=Config.PRECOMPUTE_BANK_SIZE, force=False, progress=None, tenant_id=DEFAULT_TENANT):
+    """
+    Run precompute passes for a tenant until no follow-up is queued. Returns the final
+    status, or None if another process is already running one (a follow-up is queued for it).
+    """
+    if not claim_precompute_run(tenant_id, Config.PRECOMPUTE_STALE_SECONDS):
+        return None
+    return _run_claimed(engine, workers, rate, bank_size, force, progress, tenant_id)
+
+
+def _run_claimed(engine=None, workers=Config.PRECOMPUTE_WORKERS, rate=Config.PRECOMPUTE_RATE,
+                 bank_size=Config.PRECOMPUTE_BANK_SIZE, force=False, progress=None, tenant_id=DEFAULT_TENANT):
+    if engine is None:
+        from ai_engine import AIEngine
+        engine = AIEngine()
+    try:
+        while True:
+            _run_pass(engine, workers, rate, bank_size, force, progress, tenant_id)
+            # A syllabus uploaded during the pass queued a follow-up: the pass above built
+            # its job list from the old syllabus. Follow-ups resume rather than force.
+            if not finish_precompute_run(tenant_id):
+                break
+            force = False
+    except BaseException:
+        update_precompute_run(tenant_id, running=0, finished=time.time())
+        raise
+    return precompute_status(tenant_id)
+
+
+def _run_pass(engine, workers, rate, bank_size, force, progress, tenant_id):
+    jobs = build_jobs(get_syllabus_index(tenant_id), force, tenant_id)
+    # Capacity 1: the batch job paces itself steadily instead of bursting into the quota
+    limiter = TokenBucket(rate, 1) if rate else None
+    status = {"total": len(jobs), "done": 0, "errors": 0, "started": time.time(), "finished": None}
+    update_precompute_run(tenant_id, **status)
+
+    def task(job):
+        if limiter:
+            limiter.wait()
+        _run_job(engine, job, bank_size, tenant_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(task, job): job for job in jobs}
+        for future in as_completed(futures):
+            failed = future.exception() is not None
+            status['done'] += 1
+            status['errors'] += failed
+            update_precompute_run(tenant_id, done=status['done'], errors=status['errors'])
+            if failed:
+                print(f"Precompute failed for {futures[future]}: {future.exception()}")
+            if progress:
+                progress(dict(status))
+
+
+def start_background_precompute(engine=None, tenant_id=DEFAULT_TENANT):
+    """
+    Kick off a precompute run for a tenant in a daemon thread. If any process is already
+    running one, a follow-up pass is queued for it instead (returns False): the running
+    job built its job list from the syllabus it started with, so a newer upload needs its own pass.
+    """
+    if not claim_precompute_run(tenant_id, Config.PRECOMPUTE_STALE_SECONDS):
+        return False
+    threading.Thread(target=_run_claimed, kwargs={"engine": engine, "tenant_id": tenant_id}, daemon=True).start()
+    return True
+
+
+def _print_progress(status):
+    total = status['total'] or 1
+    if status['done'] == status['total'] or status['done'] % 20 == 0:
+        elapsed = time.time() - status['started']
+        print(f"[{status['done']}/{status['total']}] {status['done'] / total * 100:5.1f}% "
+              f"errors={status['errors']} elapsed={elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute explanations and question banks.")
+    parser.add_argument('--workers', type=int, default=Config.PRECOMPUTE_WORKERS)
+    parser.add_argument('--rate', type=float, default=Config.PRECOMPUTE_RATE, help="Max generations per second (0 = unlimited)")
+    parser.add_argument('--bank-size', type=int, default=Config.PRECOMPUTE_BANK_SIZE)
+    parser.add_argument('--provider', help="Override Config.AI_PROVIDER, e.g. 'mock'")
+    parser.add_argument('--force', action='store_true', help="Regenerate everything instead of resuming")
+    parser.add_argument('--tenant', default=DEFAULT_TENANT, help="Tenant whose syllabus to precompute")
+    args = parser.parse_args()
+
+    from ai_engine import AIEngine
+    status = run_precompute(AIEngine(args.provider), args.workers, args.rate, args.bank_size,
+                            args.force, _print_progress, args.tenant)
+    if status is None:
+        print("A precompute run is already in progress for this tenant; a follow-up pass has been queued.")
+    elif not status['total']:
+        print("Nothing to do: all topics are already precomputed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Rate limiting and circuit breaking around the AI provider.
+
+Every provider call goes through ProviderGuard.call(). When the token bucket is
+empty or the circuit is open the call is rejected immediately with
+ProviderUnavailable, and AIEngine falls back to the KB/mock path without waiting
+on a provider that is throttled or down.
+
+With `shared` set, the bucket and breaker state is kept in one database row
+(data_manager.update_guard_state) and every check or update is a short locked
+read-modify-write of it, so all gunicorn workers and a precompute CLI run draw on
+one quota and see the same circuit. Without it, state is per process.
+"""
+import time
+import threading
+from metrics import Counter, Gauge, REGISTRY
+
+
+class ProviderUnavailable(Exception):
+    pass
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait(self):
+        """Blocking acquire, for batch jobs that should pace rather than fail."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._probing and self.clock() - self._probe_started >= self.reset_timeout:
+                self._probing = False # The probing process never reported back (e.g. it died)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True # Exactly one probe request while half-open
+                self._probe_started = self.clock()
+                return True
+            return False
+
+    def release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+# --- Monitoring ---
+CIRCUIT_STATE = Gauge('ai_circuit_state', 'AI provider circuit: 0 closed, 1 half-open, 2 open.')
+REJECTED = Counter('ai_provider_rejected_total', 'Provider calls skipped by the guard.', ('reason',))
+REGISTRY.extend([CIRCUIT_STATE, REJECTED])
+_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+class ProviderGuard:
+    def __init__(self, rate, burst, failure_threshold=5, reset_timeout=30, slow_call_seconds=10,
+                 clock=time.monotonic, shared=None):
+        # clock must be comparable across processes when shared (monotonic is system-wide on Linux)
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self.slow_call_seconds = slow_call_seconds
+        self.clock = clock
+        self.shared = shared # Name of the shared state row, or None for per-process state
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        rejected = self._update(self._admit)
+        if rejected:
+            REJECTED.inc(rejected)
+            raise ProviderUnavailable("AI provider circuit is open" if rejected == 'circuit_open'
+                                      else "AI provider rate limit reached")
+
+        start = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._update(self.breaker.record_failure)
+            self._publish()
+            raise
+        # The deadline is enforced by the caller's client (request_options); a call that
+        # still succeeds past the latency budget counts towards opening all the same
+        if self.clock() - start > self.slow_call_seconds:
+            self._update(self.breaker.record_failure)
+        else:
+            self._update(self.breaker.record_success)
+        self._publish()
+        return result
+
+    def _admit(self):
+        """None if the call may go ahead, else the rejection reason."""
+        if not self.breaker.allow():
+            return 'circuit_open'
+        if not self.bucket.try_acquire():
+            # A throttled call never reached the provider: release a half-open probe slot
+            self.breaker.release_probe()
+            return 'rate_limited'
+        return None
+
+    def _update(self, fn):
+        """Run fn against the current state; with `shared`, as one transaction on the shared row."""
+        with self._lock:
+            if not self.shared:
+                return fn()
+            from data_manager import update_guard_state
+
+            def apply(saved):
+                if saved:
+                    self._restore(saved)
+                result = fn()
+                return result, self._state()
+            return update_guard_state(self.shared, apply)
+
+    def _state(self):
+        b, t = self.breaker, self.bucket
+        return {"tokens": t.tokens, "updated": t._updated, "state": b.state, "failures": b.failures,
+                "opened_at": b.opened_at, "probing": b._probing, "probe_started": b._probe_started}
+
+    def _restore(self, saved):
+        b, t = self.breaker, self.bucket
+        t.tokens, t._updated = saved['tokens'], saved['updated']
+        b.state, b.failures, b.opened_at = saved['state'], saved['failures'], saved['opened_at']
+        b._probing, b._probe_started = saved['probing'], saved['probe_started']
+
+    def _publish(self):
+        CIRCUIT_STATE.set(_STATE_VALUES[self.breaker.state])
+
+    def snapshot(self):
+        if self.shared:
+            self._update(self.bucket._refill) # Load the current shared state
+        b = self.breaker
+        return {
+            "state": b.state,
+            "consecutive_failures": b.failures,
+            "open_for_seconds": round(self.clock() - b.opened_at, 1) if b.state != b.CLOSED and b.opened_at else 0,
+            "tokens": round(self.bucket.tokens, 2)
+        }
+
+
+class FakeProvider:
+    """
+    Stand-in for the Gemini model. `script` is a sequence of outcomes consumed one
+    per call: 'ok', 'error', or a number of seconds to "take" (advances `clock`).
+    Like the real client, a call slower than request_options["timeout"] is cut off
+    at the deadline and raises TimeoutError.
+    """
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, script=(), text='[]', clock=None):
+        self.script = list(script)
+        self.text = text
+        self.clock = clock
+        self.calls = 0
+        self.last_request_options = None
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.calls += 1
+        self.last_request_options = request_options
+        outcome = self.script.pop(0) if self.script else 'ok'
+        if outcome == 'error':
+            raise RuntimeError("injected provider failure")
+        if isinstance(outcome, (int, float)) and self.clock:
+            timeout = (request_options or {}).get('timeout')
+            if timeout is not None and outcome > timeout:
+                self.clock.advance(timeout)
+                raise TimeoutError(f"deadline of {timeout}s exceeded")
+            self.clock.advance(outcome)
+        return self.Response(self.text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+if __name__ == "__main__":
+    # Walk the breaker through open -> half-open -> closed against injected failures
+    clock = FakeClock()
+    provider = FakeProvider(['error'] * 3 + [15, 'ok'], clock=clock)
+    guard = ProviderGuard(rate=1, burst=5, failure_threshold=3, reset_timeout=30, slow_call_seconds=10, clock=clock)
+
+    def attempt(label):
+        try:
+            guard.call(provider.generate_content, "prompt")
+            outcome = "ok"
+        except Exception as e:
+            outcome = f"{type(e).__name__}: {e}"
+        print(f"{label:28} -> {outcome:45} {guard.snapshot()}")
+
+    for i in range(3):
+        attempt(f"failure {i + 1}")
+    attempt("while open")
+    clock.advance(31)
+    attempt("half-open probe (slow)")
+    clock.advance(31)
+    attempt("half-open probe")
+    attempt("closed again")
+    print(f"Provider was called {provider.calls} times")
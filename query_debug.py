@@ -0,0 +1,177 @@
+"""
+SQL debugging aids: per-request statement log, N+1 detection and a slow-query log
+with EXPLAIN QUERY PLAN output.
+
+In the app: set QUERY_DEBUG=1 in the environment (see config.py).
+In scripts:
+    with QueryRecorder() as rec:
+        client.get('/professor/analytics')
+    print(rec.report())
+In pytest (add `from query_debug import query_recorder` to a conftest.py):
+    def test_dashboard_budget(client, query_recorder):
+        client.get('/dashboard')
+        query_recorder.assert_budget(max_queries=5)
+"""
+import re
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from data_manager import add_query_listener, remove_query_listener
+
+logger = logging.getLogger('query_debug')
+
+DEFAULT_REPEAT_THRESHOLD = 10
+DEFAULT_SLOW_MS = 50
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def statement_template(sql):
+    """Collapse whitespace and literals so the same query shape groups together."""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _LITERALS.sub('?', sql)
+    return _IN_LIST.sub('(?...)', sql)
+
+
+def params_shape(params):
+    if params is None:
+        return 'many'
+    if isinstance(params, dict):
+        return {k: type(v).__name__ for k, v in params.items()}
+    return tuple(type(p).__name__ for p in params)
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN lines, bypassing the traced execute so it isn't recorded itself."""
+    if params is None:
+        return []
+    try:
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(explain failed: {e})"]
+    return [row[-1] for row in rows]
+
+
+class QueryRecorder:
+    """Records statements executed on the current thread while active."""
+
+    def __init__(self, repeat_threshold=DEFAULT_REPEAT_THRESHOLD, slow_ms=DEFAULT_SLOW_MS):
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self.queries = []
+        self._thread = None
+
+    def start(self):
+        self.queries = []
+        self._thread = threading.get_ident()
+        add_query_listener(self._record)
+        return self
+
+    def stop(self):
+        remove_query_listener(self._record)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _record(self, conn, sql, params, seconds):
+        if threading.get_ident() != self._thread:
+            return
+        ms = seconds * 1000
+        self.queries.append({
+            "sql": sql,
+            "template": statement_template(sql),
+            "params": params_shape(params),
+            "ms": ms
+        })
+        if ms >= self.slow_ms:
+            plan = explain(conn, sql, params)
+            logger.warning("Slow query (%.1fms): %s\n  plan: %s", ms, statement_template(sql), ' | '.join(plan))
+
+    # --- Analysis ---
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(q['ms'] for q in self.queries)
+
+    def repeated(self, threshold=None):
+        """Statement templates run at least `threshold` times: likely N+1 loops."""
+        threshold = threshold or self.repeat_threshold
+        counts = Counter(q['template'] for q in self.queries)
+        return [(tpl, n) for tpl, n in counts.most_common() if n >= threshold]
+
+    def report(self):
+        lines = [f"{self.count} queries, {self.total_ms:.1f}ms total"]
+        for tpl, n in self.repeated():
+            lines.append(f"  possible N+1: {n}x {tpl}")
+        return '\n'.join(lines)
+
+    def assert_budget(self, max_queries=None, max_repeats=None):
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"{self.count} queries exceeds budget of {max_queries}")
+        if max_repeats is not None:
+            for tpl, n in self.repeated(max_repeats + 1):
+                problems.append(f"{n}x repeated (limit {max_repeats}): {tpl}")
+        assert not problems, "Query budget exceeded:\n" + '\n'.join(problems) + '\n' + self.report()
+
+
+def init_app(app):
+    """Per-request recording when QUERY_DEBUG is on. Adds X-Query-Count/X-Query-Ms headers."""
+    if not app.config.get('QUERY_DEBUG'):
+        return
+    from flask import g, request
+
+    threshold = app.config.get('QUERY_DEBUG_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+    slow_ms = app.config.get('SLOW_QUERY_MS', DEFAULT_SLOW_MS)
+    log_file = app.config.get('SLOW_QUERY_LOG')
+    if log_file and not logger.handlers:
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    @app.before_request
+    def _start_recording():
+        g._query_recorder = QueryRecorder(threshold, slow_ms).start()
+
+    @app.after_request
+    def _report_queries(response):
+        rec = g.get('_query_recorder')
+        if rec is None:
+            return response
+        rec.stop()
+        for tpl, n in rec.repeated():
+            logger.warning("Possible N+1 in %s %s: %dx %s", request.method, request.path, n, tpl)
+        response.headers['X-Query-Count'] = str(rec.count)
+        response.headers['X-Query-Ms'] = f"{rec.total_ms:.1f}"
+        return response
+
+    @app.teardown_request
+    def _stop_recording(exc):
+        # after_request is skipped when a view raises; teardown always runs, so the listener can't leak
+        rec = g.pop('_query_recorder', None)
+        if rec is not None:
+            rec.stop()
+
+
+# --- pytest integration ---
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_recorder():
+        with QueryRecorder() as rec:
+            yield rec
@@ -0,0 +1,64 @@
+"""
+Compact quiz payloads with server-held answer keys.
+
+/api/quiz sends each question's options as indices into one shared option list
+(offline distractors repeat heavily across a paper) and never sends answers. The
+answer key is stored under a random single-use token, with options reshuffled
+per token; /submit_quiz grades the submitted option positions against it.
+"""
+import secrets
+from config import Config
+from data_manager import DEFAULT_TENANT, save_quiz_key, take_quiz_key
+
+
+def compact_quiz(questions):
+    """Returns (payload questions, shared option strings, answer key as option positions)."""
+    option_ids = {}
+    items, key = [], []
+    for q in questions:
+        item = {"q": q['question'], "o": [option_ids.setdefault(o, len(option_ids)) for o in q['options']]}
+        if q.get('image'):
+            item["img"] = q['image']
+        items.append(item)
+        key.append(next((i for i, o in enumerate(q['options']) if o == q['answer']), None))
+    return items, list(option_ids), key
+
+
+def shuffle_options(questions, rng):
+    """Copies of the questions with each one's options in a fresh order."""
+    shuffled = []
+    for q in questions:
+        options = list(q['options'])
+        rng.shuffle(options)
+        shuffled.append(dict(q, options=options))
+    return shuffled
+
+
+def issue_quiz(username, topic_id, questions, tenant_id=DEFAULT_TENANT):
+    # Cached questions repeat across issues: a per-token option order keeps one
+    # quiz's answer key from being probed one answer at a time on re-issues.
+    items, options, key = compact_quiz(shuffle_options(questions, secrets.SystemRandom()))
+    token = secrets.token_urlsafe(16)
+    save_quiz_key(token, username, topic_id, key, Config.QUIZ_KEY_TTL, Config.QUIZ_KEYS_PER_USER, tenant_id)
+    return {"token": token, "topic_id": topic_id, "options": options, "questions": items}
+
+
+def valid_answers(answers):
+    """Submitted answers must be a list of option positions (int) or None for unanswered."""
+    return answers is None or (isinstance(answers, list) and
+                               all(a is None or (isinstance(a, int) and not isinstance(a, bool)) for a in answers))
+
+
+def grade_quiz(token, username, answers, tenant_id=DEFAULT_TENANT):
+    """
+    answers: chosen option position per question (None/missing = unanswered), already
+    checked with valid_answers(). Returns (topic_id, score, total), or None if the token
+    is unknown, expired, already used or belongs to another user or tenant.
+    """
+    entry = take_quiz_key(token, username, Config.QUIZ_KEY_TTL, tenant_id)
+    if not entry:
+        return None
+    key = entry['answers']
+    answers = (answers or [])[:len(key)]
+    score = sum(1 for given, correct in zip(answers, key) if correct is not None and given == correct)
+    return entry['topic_id'], score, len(key)
@@ -0,0 +1,99 @@
+"""
+Stratified topic sampling for mixed exams.
+
+Draws k topics spread evenly across subjects and, within a subject, across units,
+using the strata precomputed by SyllabusIndex. Within a unit, topics are drawn by
+difficulty weight (bisect over cumulative weights) and the student's weak topics
+are favoured by rejection sampling, so the cost depends on k, not on syllabus size.
+Slots a small subject can't fill are handed to subjects with topics left, so k topics
+come back whenever the syllabus has at least k.
+"""
+import random
+from bisect import bisect_right
+
+WEAK_BOOST = 3.0 # A weak topic is this many times likelier to be drawn
+MAX_ATTEMPTS = 12 # Per draw, before accepting whatever was proposed
+
+
+def new_rng(seed=None):
+    """Per-request RNG; returns (rng, seed) so a paper can be regenerated exactly."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 31)
+    return random.Random(seed), seed
+
+
+def _draw(unit, rng, chosen, weak_topics):
+    topics, cum_weights = unit
+    total = cum_weights[-1]
+    candidate = None
+    for _ in range(MAX_ATTEMPTS):
+        t = topics[bisect_right(cum_weights, rng.random() * total)]
+        if t['id'] in chosen:
+            continue
+        candidate = t
+        # Proposals are difficulty-weighted; keeping non-weak ones with p = 1/boost
+        # turns that into difficulty x weakness weighting.
+        if t['id'] in weak_topics or rng.random() * WEAK_BOOST < 1:
+            return t
+    if candidate is None:
+        # Every proposal was already chosen: take a remaining topic directly, so None means exhausted
+        rest = [t for t in topics if t['id'] not in chosen]
+        candidate = rng.choice(rest) if rest else None
+    return candidate
+
+
+def _fill(units, quota, rng, picked, chosen, weak_topics):
+    """Draws up to quota topics from one subject; returns how many slots it couldn't fill."""
+    offset = rng.randrange(len(units))
+    misses = 0
+    # Round-robin over units from a random start so no unit is over-represented
+    while quota > 0 and misses < len(units):
+        unit = units[offset % len(units)]
+        offset += 1
+        t = _draw(unit, rng, chosen, weak_topics)
+        if t is None:
+            misses += 1 # Unit exhausted; move on
+            continue
+        misses = 0
+        chosen.add(t['id'])
+        picked.append(t)
+        quota -= 1
+    return quota
+
+
+def sample_topics(index, k, rng, weak_topics=()):
+    weak_topics = set(weak_topics)
+    strata = index.strata
+    if not strata or k <= 0:
+        return []
+
+    # Even split across subjects; the remainder goes to randomly chosen subjects
+    if len(strata) > k:
+        quotas = {i: 1 for i in rng.sample(range(len(strata)), k)}
+    else:
+        base, extra = divmod(k, len(strata))
+        quotas = {i: base for i in range(len(strata))}
+        for i in rng.sample(range(len(strata)), extra):
+            quotas[i] += 1
+
+    picked, chosen = [], set()
+    shortfall, open_subjects = 0, []
+    for i in range(len(strata)):
+        unfilled = _fill(strata[i][1], quotas.get(i, 0), rng, picked, chosen, weak_topics)
+        shortfall += unfilled
+        if not unfilled:
+            open_subjects.append(i)
+
+    # Redistribute unfilled slots one at a time over subjects that still have topics
+    rng.shuffle(open_subjects)
+    while shortfall and open_subjects:
+        for i in list(open_subjects):
+            if not shortfall:
+                break
+            if _fill(strata[i][1], 1, rng, picked, chosen, weak_topics):
+                open_subjects.remove(i)
+            else:
+                shortfall -= 1
+
+    rng.shuffle(picked)
+    return picked
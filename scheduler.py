@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+# SM-2 spaced repetition constants
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASS_QUALITY = 3
+DUE_FORMAT = '%Y-%m-%d %H:%M:%S'  # Lexically sortable, so SQLite can index it
+
+
+def quality_from_score(score, total):
+    """Map a quiz result onto the SM-2 0-5 recall quality scale."""
+    if not total:
+        return 0
+    return max(0, min(5, int(round(score / total * 5))))
+
+
+def sm2_update(ease, interval, repetitions, quality):
+    """Return the new (ease, interval_days, repetitions) after one review."""
+    if quality < PASS_QUALITY:
+        repetitions = 0
+        interval = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = int(round(interval * ease))
+
+    ease = ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return max(MIN_EASE, ease), interval, repetitions
+
+
+def format_due(dt):
+    return dt.strftime(DUE_FORMAT)
+
+
+def next_due(interval, now=None):
+    now = now or datetime.now()
+    return format_due(now + timedelta(days=interval))
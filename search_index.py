@@ -0,0 +1,143 @@
+"""
+Autocomplete search over subject, unit and topic names plus KB titles.
+
+Every name is split into words; the distinct words are kept in a sorted array so a
+prefix lookup is a bisect plus a short scan, and each word maps to the entries
+containing it. A query matches an entry when every query word is a prefix of one
+of the entry's words. Query words with no prefix match at all are retried with
+one typo (edit, insert, delete or transposition), still through the sorted array.
+
+Each tenant's index is rebuilt lazily whenever get_syllabus_index() hands out a
+new SyllabusIndex for it, i.e. after syllabus.json changes or an upload invalidates it.
+"""
+import re
+import heapq
+import threading
+from bisect import bisect_left
+from itertools import chain
+from data_manager import DEFAULT_TENANT
+from syllabus_index import get_syllabus_index
+
+MIN_QUERY = 2
+KIND_RANK = {"topic": 0, "unit": 1, "subject": 2}
+_WORDS = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _WORDS.findall(text.lower())
+
+
+def _one_typo(word, alphabet):
+    """
+    Prefixes one edit away from word (Norvig-style). Edits at the last position
+    collapse into the single prefix word[:-1], which already covers them.
+    """
+    head = word[:-1]
+    splits = [(word[:i], word[i:]) for i in range(len(word) - 1)]
+    deletes = [a + b[1:] for a, b in splits]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits]
+    replaces = [a + c + b[1:] for a, b in splits for c in alphabet if c != b[0]]
+    inserts = [a + c + b for a, b in splits for c in alphabet]
+    return set(deletes + transposes + replaces + inserts + [head])
+
+
+class SearchIndex:
+    def __init__(self, index, kb_titles=None):
+        # entries: (kind, id, display name, context, normalised match text, subject id)
+        self.entries = []
+        unit_names = {}
+        for subj in index.syllabus.get('subjects', []):
+            self._add('subject', subj['id'], subj['name'], '', subj['id'])
+            for unit in subj.get('units', []):
+                unit_names[unit.get('id')] = unit['name']
+                self._add('unit', unit.get('id'), unit['name'], subj['name'], subj['id'])
+        for t in index.topics.values():
+            context = f"{index.subjects.get(t['subject_id'], '')} › {unit_names.get(t['unit_id'], '')}"
+            self._add('topic', t['id'], t['name'], context.strip(' ›'), t['subject_id'])
+
+        # KB titles are aliases for the syllabus topics they describe (same match rule as AIEngine)
+        for title in (kb_titles or {}).values():
+            lowered = title.lower()
+            for t in index.topics.values():
+                name = t['name'].lower()
+                if lowered in name or name in lowered:
+                    self._add('topic', t['id'], t['name'], f"Also known as: {title}", t['subject_id'], title)
+
+        # Entry ids double as the static ranking: topics before units before subjects, shorter names first
+        self.entries.sort(key=lambda e: (KIND_RANK[e[0]], len(e[2]), e[2]))
+        # Whole-name prefixes ("cloud comp" -> "Cloud Computing ...") rank above word-prefix matches
+        self.names = sorted((e[4], i) for i, e in enumerate(self.entries))
+
+        postings = {}
+        for i, entry in enumerate(self.entries):
+            for word in set(entry[4].split()):
+                postings.setdefault(word, []).append(i)
+        self.words = sorted(postings)
+        self.postings = [postings[w] for w in self.words]
+        self.alphabet = sorted(set(''.join(self.words))) # Typo edits only try characters that occur
+
+    def _add(self, kind, item_id, name, context, subject_id, match_text=None):
+        self.entries.append((kind, item_id, name, context, ' '.join(tokenize(match_text or name)), subject_id))
+
+    def _prefix_matches(self, prefix):
+        """Entry ids having a word that starts with prefix."""
+        found = set()
+        i = bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            found.update(self.postings[i])
+            i += 1
+        return found
+
+    def search(self, query, limit=10):
+        terms = tokenize(query)
+        if len(''.join(terms)) < MIN_QUERY:
+            return []
+
+        candidates, fuzzy = None, False
+        # Most selective (longest) terms first so the intersection shrinks quickly
+        for term in sorted(set(terms), key=len, reverse=True):
+            matched = self._prefix_matches(term)
+            if not matched and len(term) >= 3:
+                fuzzy = True
+                for variant in _one_typo(term, self.alphabet):
+                    matched |= self._prefix_matches(variant)
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        phrase = ' '.join(terms)
+        exact = set()
+        i = bisect_left(self.names, (phrase,))
+        while i < len(self.names) and self.names[i][0].startswith(phrase):
+            exact.add(self.names[i][1])
+            i += 1
+        exact &= candidates
+
+        results, seen = [], set()
+        # Ids are ranks; a few spare slots absorb topics that also matched through a KB alias
+        wanted = limit + 5
+        for i in chain(heapq.nsmallest(wanted, exact), heapq.nsmallest(wanted, candidates - exact)):
+            kind, item_id, name, context, _, subject_id = self.entries[i]
+            if (kind, item_id) in seen:
+                continue # A topic matched by both its name and a KB alias
+            seen.add((kind, item_id))
+            results.append({"type": kind, "id": item_id, "name": name, "context": context,
+                            "subject_id": subject_id, "fuzzy": fuzzy})
+            if len(results) >= limit:
+                break
+        return results
+
+# --- Cached per tenant, keyed on the SyllabusIndex it was built from ---
+_cache = {} # tenant_id -> (source SyllabusIndex, SearchIndex)
+_lock = threading.Lock()
+
+
+def get_search_index(kb_titles=None, tenant_id=DEFAULT_TENANT):
+    source = get_syllabus_index(tenant_id)
+    cached = _cache.get(tenant_id)
+    if cached and cached[0] is source:
+        return cached[1]
+    index = SearchIndex(source, kb_titles) # Built outside the lock; a racing rebuild is harmless
+    with _lock:
+        _cache[tenant_id] = (source, index)
+    return index
@@ -0,0 +1,131 @@
+"""
+Synthetic data generator for scale testing.
+Writes a syllabus.json and a populated study_companion.db into a scratch directory.
+
+Usage: python seed_data.py --out /tmp/study_scale --students 5000 --subjects 6 --units 5 --topics 6
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+
+DIFFICULTIES = ["Easy", "Moderate", "Hard"]
+CHUNK = 10000
+
+
+def build_syllabus(num_subjects, units_per_subject, topics_per_unit, rng):
+    subjects = []
+    for s in range(num_subjects):
+        sid = f"sub{s + 1}"
+        units = []
+        for u in range(units_per_subject):
+            uid = f"{sid}_u{u + 1}"
+            topics = [{
+                "id": f"{uid}_t{t + 1}",
+                "name": f"Subject {s + 1} Unit {u + 1} Topic {t + 1}",
+                "difficulty": rng.choice(DIFFICULTIES)
+            } for t in range(topics_per_unit)]
+            units.append({"id": uid, "name": f"Unit {u + 1} of Subject {s + 1}", "topics": topics})
+        subjects.append({"id": sid, "name": f"Subject {s + 1}", "units": units})
+    return {"subjects": subjects}
+
+
+def generate_progress(username, topics, rng, now):
+    """Yield (completed_rows, score_rows, review_rows) for one student."""
+    from scheduler import DEFAULT_EASE, sm2_update, quality_from_score, next_due
+
+    # Students differ in both how far they are through the course and how well they score
+    ability = rng.betavariate(2.5, 2)
+    coverage = rng.betavariate(2, 2.5)
+    hardness = {"Easy": 0.15, "Moderate": 0, "Hard": -0.15}
+
+    completed, scores, reviews = [], [], []
+    for t in topics:
+        if rng.random() > coverage:
+            continue
+        completed.append((username, t['id']))
+        if rng.random() < 0.7: # Most, not all, completed topics get a quiz
+            p = max(0.05, min(0.98, ability + hardness.get(t['difficulty'], 0)))
+            score = sum(rng.random() < p for _ in range(5))
+            taken = now - timedelta(days=rng.randint(0, 60))
+            scores.append((username, t['id'], score, 5, str(taken)))
+            ease, interval, reps = sm2_update(DEFAULT_EASE, 0, 0, quality_from_score(score, 5))
+            reviews.append((username, t['id'], ease, interval, reps, next_due(interval, taken)))
+    return completed, scores, reviews
+
+
+def seed(out_dir, num_students, num_subjects, units, topics_per_unit, seed_value=42):
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = os.path.join(out_dir, 'study_companion.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    rng = random.Random(seed_value)
+    syllabus = build_syllabus(num_subjects, units, topics_per_unit, rng)
+    with open(os.path.join(out_dir, 'syllabus.json'), 'w') as f:
+        json.dump(syllabus, f, indent=4)
+
+    # data_manager picks its paths up at import time
+    os.environ['STUDY_DATA_DIR'] = out_dir
+    os.environ['STUDY_DB_PATH'] = db_path
+    from data_manager import get_db_connection, rebuild_leaderboard
+
+    topics = [t for s in syllabus['subjects'] for u in s['units'] for t in u['topics']]
+    now = datetime.now()
+    conn = get_db_connection()
+    conn.execute('DELETE FROM users')
+    conn.execute('INSERT INTO users (username, password, roll_number, name, email, role) VALUES (?, ?, ?, ?, ?, ?)',
+                 ('professor', 'prof', 'P001', 'Bench Professor', 'prof@college.edu', 'professor'))
+
+    users, completed, scores, reviews = [], [], [], []
+
+    def flush():
+        conn.executemany('INSERT INTO users (username, password, roll_number, name, email, role) VALUES (?, ?, ?, ?, ?, ?)', users)
+        conn.executemany('INSERT INTO topics_completed (username, topic_id) VALUES (?, ?)', completed)
+        conn.executemany('INSERT INTO quiz_scores (username, topic_id, score, total, timestamp) VALUES (?, ?, ?, ?, ?)', scores)
+        conn.executemany('''
+            INSERT INTO review_schedule (username, topic_id, ease, interval_days, repetitions, due)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', reviews)
+        for rows in (users, completed, scores, reviews):
+            rows.clear()
+
+    for i in range(num_students):
+        username = f"student{i}"
+        users.append((username, '1111', str(100000 + i), f"Student {i}", f"{username}@college.edu", 'student'))
+        c, s, r = generate_progress(username, topics, rng, now)
+        completed.extend(c)
+        scores.extend(s)
+        reviews.extend(r)
+        if len(scores) >= CHUNK:
+            flush()
+    flush()
+    conn.commit()
+    conn.close()
+
+    rebuild_leaderboard()
+    return {"students": num_students, "subjects": num_subjects, "topics": len(topics), "db": db_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic scale-test dataset.")
+    parser.add_argument('--out', required=True, help="Scratch directory (never point this at data/)")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--subjects', type=int, default=6)
+    parser.add_argument('--units', type=int, default=5)
+    parser.add_argument('--topics', type=int, default=6, help="Topics per unit")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    if os.path.abspath(args.out) == data_dir:
+        sys.exit("Refusing to overwrite the real data/ directory.")
+
+    info = seed(args.out, args.students, args.subjects, args.units, args.topics, args.seed)
+    print(f"Seeded {info['students']} students, {info['topics']} topics into {info['db']}")
+
+
+if __name__ == "__main__":
+    main()
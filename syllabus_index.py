@@ -0,0 +1,86 @@
+import os
+import threading
+from itertools import accumulate
+from data_manager import DEFAULT_TENANT, tenant_dir, load_json
+
+SYLLABUS_FILE = 'syllabus.json'
+
+# Relative sampling weight of each difficulty when drawing exam topics
+DIFFICULTY_WEIGHTS = {"Easy": 1.0, "Moderate": 1.5, "Hard": 2.0}
+
+
+class SyllabusIndex:
+    """Flat, precomputed view of syllabus.json so routes don't rescan the tree."""
+
+    def __init__(self, syllabus):
+        self.syllabus = syllabus
+        self.subjects = {}  # subject_id -> subject name
+        self.topics = {}    # topic_id -> flat topic record
+        # Sampling strata: [(subject_id, [(unit topics, cumulative difficulty weights), ...]), ...]
+        self.strata = []
+
+        for subj in syllabus.get('subjects', []):
+            self.subjects[subj['id']] = subj['name']
+            units = []
+            for unit in subj.get('units', []):
+                unit_topics = []
+                for t in unit.get('topics', []):
+                    record = {
+                        "id": t['id'],
+                        "name": t['name'],
+                        "difficulty": t.get('difficulty', 'Moderate'),
+                        "subject_id": subj['id'],
+                        "unit_id": unit.get('id')
+                    }
+                    self.topics[t['id']] = record
+                    unit_topics.append(record)
+                if unit_topics:
+                    weights = [DIFFICULTY_WEIGHTS.get(t['difficulty'], 1.0) for t in unit_topics]
+                    units.append((unit_topics, list(accumulate(weights))))
+            if units:
+                self.strata.append((subj['id'], units))
+
+    def topic(self, topic_id):
+        return self.topics.get(topic_id)
+
+    def topic_name(self, topic_id, default=None):
+        t = self.topics.get(topic_id)
+        return t['name'] if t else default
+
+
+# --- Cached loader ---
+# One index per tenant, rebuilt only when that tenant's syllabus.json changes on
+# disk (or is explicitly invalidated after an upload), instead of on every request.
+# Each tenant has its own lock so rebuilding a large syllabus never stalls another tenant.
+_cache = {} # tenant_id -> {"stamp", "index", "lock"}
+_registry_lock = threading.Lock()
+
+
+def _entry(tenant_id):
+    with _registry_lock:
+        return _cache.setdefault(tenant_id, {"stamp": None, "index": None, "lock": threading.Lock()})
+
+
+def _file_stamp(tenant_id):
+    try:
+        st = os.stat(os.path.join(tenant_dir(tenant_id), SYLLABUS_FILE))
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_syllabus_index(tenant_id=DEFAULT_TENANT):
+    entry = _entry(tenant_id)
+    stamp = _file_stamp(tenant_id)
+    with entry['lock']:
+        if entry['index'] is None or entry['stamp'] != stamp:
+            entry['index'] = SyllabusIndex(load_json(SYLLABUS_FILE, tenant_id))
+            entry['stamp'] = stamp
+        return entry['index']
+
+
+def invalidate_syllabus_index(tenant_id=DEFAULT_TENANT):
+    entry = _entry(tenant_id)
+    with entry['lock']:
+        entry['index'] = None
+        entry['stamp'] = None
@@ -0,0 +1,151 @@
+"""
+Multi-course tenancy: several departments/colleges served from one deployment.
+
+Each tenant has its own directory under data/tenants/<tenant_id>/ (syllabus.json,
+syllabus_meta.json), its own rows in every table (tenant_id column) and its own
+warm state: syllabus and search indexes (cached per tenant in their modules),
+leaderboard rank trees and a byte-bounded content cache. Nothing is shared between
+tenants' caches, so one tenant's upload or bulk import can only evict its own entries.
+
+The tenant is picked per request from the X-Tenant header (set by the reverse proxy)
+or the subdomain under Config.TENANT_BASE_DOMAIN; requests with neither use the
+default tenant, which keeps the original single-course layout in data/.
+
+Usage: python tenants.py create <tenant_id> [syllabus.json]
+       python tenants.py list
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from flask import g, session, request, has_request_context, abort
+from config import Config
+from data_manager import DEFAULT_TENANT, TENANTS_DIR, tenant_dir
+from leaderboard import Leaderboard
+
+TENANT_ID = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+
+
+def tenant_exists(tenant_id):
+    if tenant_id == DEFAULT_TENANT:
+        return True
+    return bool(TENANT_ID.match(tenant_id)) and os.path.isdir(tenant_dir(tenant_id))
+
+
+def list_tenants():
+    found = []
+    if os.path.isdir(TENANTS_DIR):
+        found = sorted(t for t in os.listdir(TENANTS_DIR) if t != DEFAULT_TENANT and tenant_exists(t))
+    return [DEFAULT_TENANT] + found
+
+
+def create_tenant(tenant_id, syllabus_path=None):
+    if not TENANT_ID.match(tenant_id) or tenant_id == DEFAULT_TENANT:
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    os.makedirs(tenant_dir(tenant_id), exist_ok=True)
+    if syllabus_path:
+        shutil.copyfile(syllabus_path, os.path.join(tenant_dir(tenant_id), 'syllabus.json'))
+
+
+def resolve_tenant(req):
+    """Tenant id requested by req, or None if it names a tenant that doesn't exist."""
+    tenant_id = req.headers.get(Config.TENANT_HEADER, '').strip().lower()
+    if not tenant_id and Config.TENANT_BASE_DOMAIN:
+        host = req.host.split(':')[0].lower()
+        suffix = '.' + Config.TENANT_BASE_DOMAIN
+        if host.endswith(suffix):
+            tenant_id = host[:-len(suffix)]
+    if not tenant_id or tenant_id == 'www':
+        return DEFAULT_TENANT
+    return tenant_id if tenant_exists(tenant_id) else None
+
+
+def current_tenant():
+    if has_request_context():
+        return g.get('tenant', DEFAULT_TENANT)
+    return DEFAULT_TENANT
+
+
+class ContentCache:
+    """LRU of decoded content_cache payloads, bounded by (approximate) serialized bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict() # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key][0]
+        value = loader()
+        if value is None:
+            return None # Misses aren't cached: precompute may fill them in at any time
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class TenantState:
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.leaderboard = Leaderboard(tenant_id)
+        self.content = ContentCache(Config.TENANT_CONTENT_CACHE_BYTES)
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def get_tenant_state(tenant_id=None):
+    tenant_id = tenant_id or current_tenant()
+    with _states_lock:
+        state = _states.get(tenant_id)
+        if state is None:
+            state = _states[tenant_id] = TenantState(tenant_id)
+        return state
+
+
+def init_app(app):
+    @app.before_request
+    def _select_tenant():
+        tenant_id = resolve_tenant(request)
+        if tenant_id is None:
+            abort(404)
+        g.tenant = tenant_id
+        # A session belongs to the tenant it logged in on; elsewhere it is anonymous
+        if 'user' in session and session.get('tenant', DEFAULT_TENANT) != tenant_id:
+            session.clear()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == 'create':
+        create_tenant(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"Created tenant {sys.argv[2]} in {tenant_dir(sys.argv[2])}")
+    elif len(sys.argv) == 2 and sys.argv[1] == 'list':
+        print('\n'.join(list_tenants()))
+    else:
+        print("Usage: python tenants.py create <tenant_id> [syllabus.json] | python tenants.py list")
@@ -0,0 +1,28 @@
+import os
+import shutil
+import tempfile
+
+# data_manager migrates the database on import: point it at a scratch copy of data/
+# before any test module imports it, so the shipped database is never touched.
+_data_dir = os.path.join(tempfile.mkdtemp(prefix='study_tests_'), 'data')
+shutil.copytree(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'), _data_dir)
+os.environ['STUDY_DATA_DIR'] = _data_dir
+os.environ.pop('STUDY_DB_PATH', None)
+
+import pytest
+from query_debug import query_recorder # noqa: F401 (fixture)
+
+
+@pytest.fixture
+def app():
+    from app import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as the seeded default student."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = {'info_username': 'student', 'roll_number': '1001', 'role': 'student'}
+    return client
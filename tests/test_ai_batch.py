@@ -0,0 +1,88 @@
+import json
+from ai_engine import AIEngine
+from provider_guard import ProviderGuard, FakeProvider
+
+
+class ScriptedProvider(FakeProvider):
+    """FakeProvider returning a different response text per call (the last one repeats)."""
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = list(texts)
+        self.prompts = []
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.prompts.append(prompt)
+        self.text = self.texts.pop(0) if len(self.texts) > 1 else self.texts[0]
+        return super().generate_content(prompt, request_options, **kwargs)
+
+
+def engine_for(*texts):
+    provider = ScriptedProvider(texts)
+    return AIEngine('gemini', model=provider, guard=ProviderGuard(rate=100, burst=100)), provider
+
+
+def questions(label, count):
+    return [{"q": f"{label} question {n}?", "options": ["right", "wrong"], "a": "right"} for n in range(count)]
+
+
+def batch(*entries):
+    return json.dumps({"topics": [{"id": i, "topic": name, "questions": qs} for i, name, qs in entries]})
+
+
+def texts(result):
+    return [q['question'] for q in result]
+
+
+def test_valid_batch_uses_one_call():
+    engine, provider = engine_for(batch((0, "Alpha", questions("A", 2)), (1, "Beta", questions("B", 1))))
+    result = engine.generate_quiz_batch([("Alpha", 2, 0), ("Beta", 1, 2)])
+    assert provider.calls == 1
+    assert texts(result[0]) == ["A question 0?", "A question 1?"]
+    assert texts(result[1]) == ["B question 0?"]
+
+
+def test_duplicate_topic_names_stay_separate():
+    engine, provider = engine_for(batch((0, "Intro", questions("first", 2)), (1, "Intro", questions("second", 1))))
+    result = engine.generate_quiz_batch([("Intro", 2, 0), ("Intro", 1, 2)])
+    assert provider.calls == 1
+    assert "id 0: Intro (2 questions)" in provider.prompts[0]
+    assert "id 1: Intro (1 questions)" in provider.prompts[0]
+    assert texts(result[0]) == ["first question 0?", "first question 1?"]
+    assert texts(result[1]) == ["second question 0?"]
+
+
+def test_entry_without_id_matches_unique_name():
+    response = json.dumps({"topics": [{"topic": "alpha ", "questions": questions("A", 1)}]})
+    engine, provider = engine_for(response)
+    result = engine.generate_quiz_batch([("Alpha", 1, 0)])
+    assert provider.calls == 1
+    assert texts(result[0]) == ["A question 0?"]
+
+
+def test_partial_batch_falls_back_per_topic():
+    # Beta is missing and Gamma's questions are invalid: both go through the single path
+    invalid = [{"q": "Bad?", "options": ["x", "y"], "a": "z"}]
+    single = json.dumps(questions("single", 1))
+    engine, provider = engine_for(batch((0, "Alpha", questions("A", 1)), (2, "Gamma", invalid)), single)
+    result = engine.generate_quiz_batch([("Alpha", 1, 0), ("Beta", 1, 1), ("Gamma", 1, 2)])
+    assert provider.calls == 3
+    assert texts(result[0]) == ["A question 0?"]
+    assert texts(result[1]) == ["single question 0?"]
+    assert texts(result[2]) == ["single question 0?"]
+
+
+def test_malformed_batch_falls_back_for_every_topic():
+    engine, provider = engine_for("not json at all", "also not json")
+    result = engine.generate_quiz_batch([("Alpha", 2, 0), ("Beta", 3, 2)])
+    assert provider.calls == 3 # The batch, then one single-topic call each
+    assert [len(r) for r in result] == [2, 3] # Padded with mock questions
+    assert all(q['answer'] in q['options'] for r in result for q in r)
+
+
+def test_provider_error_goes_straight_to_mock():
+    engine, provider = engine_for("[]")
+    provider.script = ['error']
+    result = engine.generate_quiz_batch([("Alpha", 2, 0), ("Beta", 1, 2)])
+    assert provider.calls == 1
+    assert [len(r) for r in result] == [2, 1]
@@ -0,0 +1,31 @@
+import app as app_module
+from dedup import QuestionDeduper
+
+
+def question(text):
+    return {"id": 1, "question": text, "options": ["a", "b"], "answer": "a"}
+
+
+def test_near_duplicates_are_rejected():
+    deduper = QuestionDeduper()
+    assert deduper.add("Which service model provides raw computing power to the consumer?")
+    assert not deduper.add("Which service model provides raw computing power to the consumer ?")
+    assert deduper.add("What is the standard term of a patent in most countries?")
+
+
+def test_duplicate_is_replaced_by_a_unique_mock():
+    original = question("Which layer of the cloud stack does the consumer manage in IaaS?")
+    out = app_module.dedupe_questions([("Cloud", original), ("Cloud", dict(original))], "Easy")
+    assert out[0] is original
+    assert out[1]['question'] != original['question']
+
+
+def test_exhausted_retries_keep_the_original_and_index_it(monkeypatch):
+    repeated = question("Which protocol is often used in Cloud communication today?")
+    # Every replacement is itself a duplicate of the first question
+    monkeypatch.setattr(app_module.ai, 'mock_question', lambda topic, difficulty, seed: dict(repeated))
+    kb_question = question("Which protocol is often used in Cloud communication today ?")
+    later_copy = question("Which protocol is often used in Cloud communication today?!")
+    out = app_module.dedupe_questions([("Cloud", repeated), ("Cloud", kb_question), ("Cloud", later_copy)], "Easy")
+    assert out[1] is kb_question # Not swapped for an unchecked mock question
+    assert out[2] is later_copy
@@ -0,0 +1,53 @@
+import random
+from data_manager import OVERALL_BOARD, create_user, update_progress, rebuild_leaderboard, get_db_connection
+from leaderboard import Leaderboard
+
+USERS = [f"lb_student_{i}" for i in range(6)]
+TOPICS = ['cc_u1_t1', 'cc_u1_t2', 'cc_u2_t1', 'ai_u1_t1', 'ai_u3_t4', 'java_u2_t2']
+BOARDS = [OVERALL_BOARD, 'cc201', 'ai202', 'java203']
+
+
+def score(username, topic_id, got, total):
+    update_progress(username, topic_id, 'score', {"topic_id": topic_id, "score": got, "total": total})
+
+
+def board_rows():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT username, subject_id, score_sum, total_sum FROM leaderboard WHERE username LIKE ?',
+                        ('lb_student_%',)).fetchall()
+    conn.close()
+    return {(r['username'], r['subject_id']): (r['score_sum'], r['total_sum']) for r in rows}
+
+
+def standings(board):
+    # Tied rows may come back in either order; compare each board's top as (rank, username) pairs
+    tops = {b: sorted((r['rank'], r['username'], r['score_sum'], r['total_sum']) for r in board.top(b, 50))
+            for b in BOARDS}
+    return {(u, b): board.rank(u, b) for u in USERS for b in BOARDS}, tops
+
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(3)
+    for u in USERS:
+        create_user(u, 'pw', u[-1], u, f"{u}@college.edu")
+    live = Leaderboard()
+    live.sync()
+
+    for u in USERS:
+        for topic_id in rng.sample(TOPICS, 4):
+            score(u, topic_id, rng.randint(0, 5), 5)
+        # Retakes replace the earlier score (up or down)
+        for topic_id in rng.sample(TOPICS, 2):
+            score(u, topic_id, rng.randint(0, 5), 5)
+        # Subject exam scores are stored under the subject id
+        score(u, 'cc201', rng.randint(0, 25), 25)
+    score(USERS[0], 'cc201', 25, 25) # Retaken subject exam
+
+    incremental_rows = board_rows()
+    incremental = standings(live)
+
+    rebuild_leaderboard()
+    assert board_rows() == incremental_rows
+    assert standings(Leaderboard()) == incremental # A fresh process, built from the rebuilt table
+    assert standings(live) == incremental # The running one after syncing the rebuild's new seqs
+    assert incremental[0][(USERS[0], 'cc201')] is not None
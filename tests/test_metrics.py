@@ -0,0 +1,21 @@
+import json
+import metrics
+from config import Config
+
+
+def test_render_sums_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    counter = metrics.Counter('test_events_total', 'Test counter.', ('kind',))
+    gauge = metrics.Gauge('test_state', 'Test gauge.')
+    monkeypatch.setattr(metrics, 'REGISTRY', [counter, gauge])
+    counter.inc('a', amount=2)
+
+    # Another worker still running (pid 1 always exists) and one that has exited
+    (tmp_path / '1.json').write_text(json.dumps({'test_events_total': [[['a'], 3], [['b'], 1]], 'test_state': 2}))
+    (tmp_path / '999999999.json').write_text(json.dumps({'test_events_total': [[['a'], 5]], 'test_state': 1}))
+
+    text = metrics.render()
+    assert 'test_events_total{kind="a"} 10' in text # Exited workers' counts are kept
+    assert 'test_events_total{kind="b"} 1' in text
+    assert 'test_state 2' in text
+    assert counter.snapshot() == [[['a'], 2]] # Merging never touches the live metrics
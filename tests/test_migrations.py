@@ -0,0 +1,22 @@
+import sqlite3
+import data_manager
+
+
+def test_init_db_migrates_pre_tenancy_quiz_keys(tmp_path, monkeypatch):
+    # quiz_keys as created before tenancy: no tenant_id column yet
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE quiz_keys (token TEXT PRIMARY KEY, username TEXT, topic_id TEXT, answers TEXT, '
+                 'created REAL)')
+    conn.execute("INSERT INTO quiz_keys VALUES ('t', 'student', 'cc_u1_t1', '[0]', 1)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(data_manager, 'DB_PATH', path)
+    data_manager.init_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT tenant_id FROM quiz_keys').fetchone() == (data_manager.DEFAULT_TENANT,)
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'quiz_keys'")}
+    conn.close()
+    assert 'idx_quiz_keys_user' in indexes
@@ -0,0 +1,77 @@
+import json
+import pytest
+import precompute
+from ai_engine import AIEngine
+from provider_guard import ProviderGuard, FakeProvider
+from data_manager import claim_precompute_run, finish_precompute_run, get_content_keys
+from tenants import create_tenant
+
+SYLLABUS = {"subjects": [{"id": "pc1", "name": "Precompute Subject", "units": [
+    {"id": "pc_u1", "name": "Unit 1", "topics": [{"id": "pc_t1", "name": "Graph Search"},
+                                                {"id": "pc_t2", "name": "Dynamic Programming"}]}]}]}
+
+
+@pytest.fixture
+def tenant(tmp_path, request):
+    tenant_id = request.node.name.replace('_', '-')[:32]
+    path = tmp_path / 'syllabus.json'
+    path.write_text(json.dumps(SYLLABUS))
+    create_tenant(tenant_id, str(path))
+    return tenant_id
+
+
+def run(engine, tenant_id, **kwargs):
+    return precompute.run_precompute(engine, workers=2, rate=0, bank_size=3, tenant_id=tenant_id, **kwargs)
+
+
+def test_second_claim_queues_a_follow_up(tenant):
+    assert claim_precompute_run(tenant)
+    assert not claim_precompute_run(tenant) # Another worker's upload
+    assert precompute.precompute_status(tenant)['queued']
+    assert finish_precompute_run(tenant) # Holder runs the follow-up pass
+    assert not finish_precompute_run(tenant)
+    status = precompute.precompute_status(tenant)
+    assert not status['running'] and not status['queued']
+
+
+def test_stale_claim_is_taken_over(tenant):
+    assert claim_precompute_run(tenant)
+    assert claim_precompute_run(tenant, stale_after=-1) # The holder stopped heart-beating
+
+
+def test_run_is_resumable(tenant):
+    status = run(AIEngine('mock'), tenant)
+    assert (status['total'], status['done'], status['errors']) == (8, 8, 0) # 2 topics x (explanation + 3 banks)
+    assert not status['running']
+    assert len(get_content_keys(tenant)) == 8
+    assert run(AIEngine('mock'), tenant)['total'] == 0
+
+
+def test_run_in_progress_elsewhere_returns_none(tenant):
+    assert claim_precompute_run(tenant)
+    assert run(AIEngine('mock'), tenant) is None
+    assert precompute.precompute_status(tenant)['queued']
+
+
+def test_fallback_content_is_not_stored(tenant):
+    failing = AIEngine('gemini', model=FakeProvider(['error'] * 100), guard=ProviderGuard(100, 100, 10 ** 6))
+    status = run(failing, tenant)
+    assert status['errors'] == status['total'] == 8
+    assert get_content_keys(tenant) == {}
+    assert run(AIEngine('mock'), tenant)['total'] == 8 # Retried once the provider is back
+
+
+def test_upload_during_a_pass_gets_its_own_pass(tenant, monkeypatch):
+    passes = []
+    real_build_jobs = precompute.build_jobs
+
+    def build_jobs(index, force=False, tenant_id=None):
+        passes.append(tenant_id)
+        if len(passes) == 1:
+            assert not claim_precompute_run(tenant_id) # Upload handled by another worker mid-pass
+        return real_build_jobs(index, force, tenant_id)
+
+    monkeypatch.setattr(precompute, 'build_jobs', build_jobs)
+    status = run(AIEngine('mock'), tenant)
+    assert len(passes) == 2
+    assert not status['running'] and not status['queued']
@@ -0,0 +1,152 @@
+import pytest
+from config import Config
+from ai_engine import AIEngine
+from provider_guard import ProviderGuard, ProviderUnavailable, CircuitBreaker, FakeProvider, FakeClock
+
+
+def make_guard(clock, rate=1, burst=5):
+    return ProviderGuard(rate=rate, burst=burst, failure_threshold=3, reset_timeout=30, slow_call_seconds=10,
+                         clock=clock)
+
+
+def call(guard, provider, timeout=None):
+    options = {"timeout": timeout} if timeout is not None else None
+    return guard.call(provider.generate_content, "prompt", request_options=options)
+
+
+def test_closed_open_half_open_closed():
+    clock = FakeClock()
+    guard = make_guard(clock)
+    provider = FakeProvider(['error'] * 3, clock=clock)
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            call(guard, provider)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    # Open: rejected without reaching the provider
+    with pytest.raises(ProviderUnavailable):
+        call(guard, provider)
+    assert provider.calls == 3
+
+    clock.advance(31)
+    assert guard.breaker.allow() # The single half-open probe slot
+    assert guard.breaker.state == CircuitBreaker.HALF_OPEN
+    assert not guard.breaker.allow() # Only one probe at a time
+    guard.breaker.release_probe()
+
+    call(guard, provider)
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert guard.breaker.failures == 0
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    guard = make_guard(clock)
+    provider = FakeProvider(['error'] * 4, clock=clock)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            call(guard, provider)
+    clock.advance(31)
+    with pytest.raises(RuntimeError):
+        call(guard, provider)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(ProviderUnavailable):
+        call(guard, provider)
+
+
+def test_throttled_probe_is_released():
+    clock = FakeClock()
+    guard = make_guard(clock, rate=0.01, burst=3)
+    provider = FakeProvider(['error'] * 3, clock=clock)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            call(guard, provider)
+    assert guard.bucket.tokens < 1
+
+    # Half-open, but the bucket is empty: the probe is rejected and its slot freed
+    clock.advance(31)
+    with pytest.raises(ProviderUnavailable, match="rate limit"):
+        call(guard, provider)
+    assert not guard.breaker._probing
+
+    clock.advance(100) # Refill one token
+    call(guard, provider)
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    clock = FakeClock()
+    guard = make_guard(clock)
+    provider = FakeProvider([15, 15, 15], clock=clock)
+    for _ in range(3):
+        call(guard, provider) # Succeeds, but past slow_call_seconds
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+
+def test_deadline_cuts_off_hung_call():
+    clock = FakeClock()
+    guard = make_guard(clock)
+    provider = FakeProvider([600], clock=clock)
+    with pytest.raises(TimeoutError):
+        call(guard, provider, timeout=10)
+    assert clock.now == 10
+    assert guard.breaker.failures == 1
+
+
+def test_engine_passes_deadline_to_provider():
+    provider = FakeProvider(text='[]')
+    engine = AIEngine('gemini', model=provider, guard=ProviderGuard(rate=100, burst=100))
+    engine.get_chat_response("What is IaaS?")
+    assert provider.last_request_options == {"timeout": Config.AI_CALL_TIMEOUT}
+
+
+def shared_pair(name, clock, rate=1, burst=2):
+    # Two guards standing in for two worker processes: they only share the database row
+    return [ProviderGuard(rate=rate, burst=burst, failure_threshold=3, reset_timeout=30, slow_call_seconds=10,
+                          clock=clock, shared=name) for _ in range(2)]
+
+
+def test_shared_guards_share_one_breaker():
+    clock = FakeClock()
+    a, b = shared_pair('test-breaker', clock, burst=10)
+    provider = FakeProvider(['error'] * 3, clock=clock)
+    with pytest.raises(RuntimeError):
+        call(a, provider)
+    with pytest.raises(RuntimeError):
+        call(b, provider)
+    with pytest.raises(RuntimeError):
+        call(a, provider)
+    with pytest.raises(ProviderUnavailable, match="circuit"):
+        call(b, provider) # b never saw three failures itself
+    assert b.snapshot()['state'] == CircuitBreaker.OPEN
+
+    clock.advance(31)
+    call(b, provider) # One probe for everyone closes it
+    assert a.snapshot()['state'] == CircuitBreaker.CLOSED
+
+
+def test_shared_guards_share_one_quota():
+    clock = FakeClock()
+    a, b = shared_pair('test-quota', clock, rate=0.01, burst=2)
+    provider = FakeProvider(clock=clock)
+    call(a, provider)
+    call(b, provider)
+    for guard in (a, b):
+        with pytest.raises(ProviderUnavailable, match="rate limit"):
+            call(guard, provider)
+    assert provider.calls == 2
+
+
+def test_lost_probe_is_given_up_after_reset_timeout():
+    clock = FakeClock()
+    guard = make_guard(clock)
+    provider = FakeProvider(['error'] * 3, clock=clock)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            call(guard, provider)
+    clock.advance(31)
+    assert guard.breaker.allow() # A probe that never reports back (its process died)
+    assert not guard.breaker.allow()
+    clock.advance(31)
+    assert guard.breaker.allow()
@@ -0,0 +1,34 @@
+import pytest
+
+# Statement budgets per page: a loop that starts querying per topic/student blows these
+BUDGETS = [
+    ('/dashboard', 5),
+    ('/analysis', 12),
+    ('/leaderboard', 5),
+    ('/review', 3),
+]
+
+
+@pytest.mark.parametrize('path, max_queries', BUDGETS)
+def test_route_query_budget(client, query_recorder, path, max_queries):
+    query_recorder.stop()
+    client.get(path) # Warm caches (syllabus index, leaderboard trees) outside the budget
+    query_recorder.start()
+    assert client.get(path).status_code == 200
+    query_recorder.assert_budget(max_queries=max_queries, max_repeats=2)
+
+
+def test_removing_a_listener_mid_notify_skips_nobody():
+    import data_manager
+    calls = []
+    first = lambda *args: (calls.append('first'), data_manager.remove_query_listener(first))
+    second = lambda *args: calls.append('second')
+    data_manager.add_query_listener(first)
+    data_manager.add_query_listener(second)
+    try:
+        data_manager.get_meta('anything')
+        assert calls[:2] == ['first', 'second']
+        assert first not in data_manager.QUERY_LISTENERS
+    finally:
+        data_manager.remove_query_listener(first)
+        data_manager.remove_query_listener(second)
@@ -0,0 +1,65 @@
+import pytest
+import quiz_store
+from quiz_store import issue_quiz, grade_quiz
+
+QUESTIONS = [{"question": f"Question {n}?", "options": [f"right {n}", f"wrong {n}a", f"wrong {n}b", f"wrong {n}c"],
+              "answer": f"right {n}"} for n in range(10)]
+
+
+def correct_answers(payload):
+    return [next(i for i, o in enumerate(item['o']) if payload['options'][o].startswith('right'))
+            for item in payload['questions']]
+
+
+def test_correct_answers_score_full_marks():
+    payload = issue_quiz('grader', 'cc_u1_t1', QUESTIONS)
+    assert 'answer' not in str(payload['questions'])
+    assert grade_quiz(payload['token'], 'grader', correct_answers(payload)) == ('cc_u1_t1', 10, 10)
+
+
+def test_reissued_quiz_has_a_different_key():
+    first, second = (issue_quiz('grader', 'cc_u1_t1', QUESTIONS) for _ in range(2))
+    assert correct_answers(first) != correct_answers(second)
+    assert QUESTIONS[0]['options'][0] == 'right 0' # The cached questions are left as they were
+
+
+def test_token_is_single_use():
+    payload = issue_quiz('grader', 'cc_u1_t1', QUESTIONS)
+    assert grade_quiz(payload['token'], 'grader', []) == ('cc_u1_t1', 0, 10)
+    assert grade_quiz(payload['token'], 'grader', correct_answers(payload)) is None
+
+
+@pytest.mark.parametrize("username, tenant_id", [('someone_else', 'default'), ('grader', 'other_college')])
+def test_token_only_works_for_its_user_and_tenant(username, tenant_id):
+    payload = issue_quiz('grader', 'cc_u1_t1', QUESTIONS)
+    assert grade_quiz(payload['token'], username, correct_answers(payload), tenant_id) is None
+    # The failed attempt leaves the key for its owner
+    assert grade_quiz(payload['token'], 'grader', correct_answers(payload)) == ('cc_u1_t1', 10, 10)
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    payload = issue_quiz('grader', 'cc_u1_t1', QUESTIONS)
+    monkeypatch.setattr(quiz_store.Config, 'QUIZ_KEY_TTL', -1)
+    assert grade_quiz(payload['token'], 'grader', correct_answers(payload)) is None
+
+
+@pytest.mark.parametrize("body", [
+    "not an object",
+    {"token": 5, "answers": []},
+    {"token": "t", "answers": "0,1,2"},
+    {"token": "t", "answers": [0, "1"]},
+    {"token": "t", "answers": [True, False]},
+    {"token": "t", "answers": [0.5]},
+])
+def test_malformed_submission_is_rejected(client, body):
+    response = client.post('/submit_quiz', json=body)
+    assert response.status_code == 400
+    assert "Expected" in response.get_json()['error']
+
+
+def test_submission_is_graded_on_the_server(client):
+    payload = client.get('/api/quiz?kind=topic&id=cc_u1_t1').get_json()
+    response = client.post('/submit_quiz', json={"token": payload['token'], "answers": [], "score": 99})
+    assert response.status_code == 200
+    assert response.get_json()['score'] == 0 # The client's own score is ignored
+    assert client.post('/submit_quiz', json={"token": payload['token'], "answers": []}).status_code == 400
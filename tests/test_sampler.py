@@ -0,0 +1,50 @@
+import os
+import json
+import random
+from sampler import sample_topics
+from syllabus_index import SyllabusIndex
+from data_manager import DATA_DIR
+
+
+def make_syllabus(topics_per_subject):
+    subjects = []
+    for s, count in enumerate(topics_per_subject):
+        topics = [{"id": f"s{s}t{t}", "name": f"Subject {s} Topic {t}"} for t in range(count)]
+        # Spread each subject's topics over up to three units
+        units = [{"id": f"s{s}u{u}", "name": f"Unit {u}", "topics": topics[u::3]} for u in range(3) if topics[u::3]]
+        subjects.append({"id": f"s{s}", "name": f"Subject {s}", "units": units})
+    return {"subjects": subjects}
+
+
+def test_returns_k_when_a_subject_is_short():
+    index = SyllabusIndex(make_syllabus([1, 2, 30, 30]))
+    for seed in range(50):
+        topics = sample_topics(index, 25, random.Random(seed))
+        assert len(topics) == 25
+        assert len({t['id'] for t in topics}) == 25
+
+
+def test_returns_everything_when_syllabus_has_exactly_k():
+    index = SyllabusIndex(make_syllabus([1, 4, 20]))
+    for seed in range(20):
+        topics = sample_topics(index, 25, random.Random(seed), weak_topics=["s2t0", "s1t1"])
+        assert {t['id'] for t in topics} == set(index.topics)
+
+
+def test_returns_all_topics_when_fewer_than_k():
+    index = SyllabusIndex(make_syllabus([2, 3]))
+    assert len(sample_topics(index, 25, random.Random(0))) == 5
+
+
+def test_shipped_syllabus_gives_full_paper():
+    with open(os.path.join(DATA_DIR, 'syllabus.json')) as f:
+        index = SyllabusIndex(json.load(f))
+    k = min(25, len(index.topics))
+    for seed in range(20):
+        assert len(sample_topics(index, k, random.Random(seed))) == k
+
+
+def test_same_seed_same_paper():
+    index = SyllabusIndex(make_syllabus([1, 2, 30, 30]))
+    first = [t['id'] for t in sample_topics(index, 25, random.Random(7))]
+    assert first == [t['id'] for t in sample_topics(index, 25, random.Random(7))]
@@ -0,0 +1,97 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from data_manager import (DEFAULT_TENANT, create_user, check_user, update_progress, update_review_schedule,
+                          get_student_progress, get_due_reviews, get_class_analytics)
+from tenants import create_tenant
+
+SYLLABUS = {"subjects": [{"id": "tn1", "name": "Tenant Subject", "units": [
+    {"id": "tn_u1", "name": "Unit 1", "topics": [{"id": "tn_t1", "name": "Tenant Topic"}]}]}]}
+
+
+@pytest.fixture
+def tenant(tmp_path, request):
+    tenant_id = request.node.name.replace('_', '-')[:32]
+    path = tmp_path / 'syllabus.json'
+    path.write_text(json.dumps(SYLLABUS))
+    create_tenant(tenant_id, str(path))
+    return tenant_id
+
+
+@pytest.fixture
+def users(tenant):
+    """One student per tenant with a perfect score on their own course."""
+    home, other = f"{tenant}-home", f"{tenant}-other"
+    create_user(home, 'pw', 'T1', 'Home Student', 'home@college.edu', tenant_id=tenant)
+    create_user(other, 'pw', 'D1', 'Default Student', 'default@college.edu')
+    update_progress(home, 'tn_t1', 'score', {"score": 5, "total": 5}, tenant)
+    update_progress(other, 'cc_u1_t1', 'score', {"score": 5, "total": 5})
+    return home, other
+
+
+def logged_in(app, username, tenant_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = {'info_username': username, 'role': 'student'}
+        sess['tenant'] = tenant_id
+    return client
+
+
+def test_unknown_tenant_is_404(client):
+    assert client.get('/leaderboard', headers={'X-Tenant': 'no-such-college'}).status_code == 404
+    assert client.get('/leaderboard', headers={'X-Tenant': '../data'}).status_code == 404
+
+
+def test_session_is_cleared_on_another_tenant(client, tenant):
+    assert client.get('/leaderboard').status_code == 200
+    assert client.get('/leaderboard', headers={'X-Tenant': tenant}).status_code == 401
+    with client.session_transaction() as sess:
+        assert 'user' not in sess
+    assert client.get('/leaderboard').status_code == 401 # Stays logged out back home
+
+
+def test_login_is_scoped_to_its_tenant(app, tenant, users):
+    home, _ = users
+    client = app.test_client()
+    assert check_user(home, 'pw') is None
+    client.post('/auth/login', data={'username': home, 'password': 'pw'})
+    assert client.get('/leaderboard').status_code == 401
+    client.post('/auth/login', data={'username': home, 'password': 'pw'}, headers={'X-Tenant': tenant})
+    assert client.get('/leaderboard', headers={'X-Tenant': tenant}).status_code == 200
+
+
+def test_leaderboards_are_per_tenant(app, tenant, users):
+    home, other = users
+    on_tenant = logged_in(app, home, tenant).get('/leaderboard?n=100', headers={'X-Tenant': tenant}).get_json()
+    assert [r['username'] for r in on_tenant['top']] == [home]
+    assert on_tenant['me']['rank'] == 1
+
+    on_default = logged_in(app, other, DEFAULT_TENANT).get('/leaderboard?n=100').get_json()
+    names = [r['username'] for r in on_default['top']]
+    assert other in names and home not in names
+
+
+def test_quiz_keys_are_per_tenant(app, tenant, users):
+    home, _ = users
+    client = logged_in(app, home, tenant)
+    payload = client.get('/api/quiz?kind=topic&id=tn_t1', headers={'X-Tenant': tenant}).get_json()
+    submission = {"token": payload['token'], "answers": []}
+
+    # Same username and token, presented on another tenant
+    assert logged_in(app, home, DEFAULT_TENANT).post('/submit_quiz', json=submission).status_code == 400
+    response = client.post('/submit_quiz', json=submission, headers={'X-Tenant': tenant})
+    assert response.status_code == 200
+    assert response.get_json()['total'] == len(payload['questions'])
+
+
+def test_data_functions_filter_by_tenant(tenant, users):
+    home, other = users
+    update_review_schedule(home, 'tn_t1', 0, 5, tenant_id=tenant)
+    assert get_student_progress(home, tenant)['quiz_scores'].keys() == {'tn_t1'}
+    assert get_student_progress(home)['quiz_scores'] == {}
+    later = datetime.now() + timedelta(days=30)
+    assert [r['topic_id'] for r in get_due_reviews(home, now=later, tenant_id=tenant)] == ['tn_t1']
+    assert get_due_reviews(home, now=later) == []
+    assert [s['name'] for s in get_class_analytics(tenant)] == ['Home Student']
+    assert get_class_analytics(tenant)[0]['performance'] == 100
+    assert 'Home Student' not in [s['name'] for s in get_class_analytics()]